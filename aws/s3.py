@@ -1,197 +1,350 @@
-"""S3 utilities for reading and writing data."""
-import boto3
-import botocore
-import gzip
-import json
-import logging
-from io import BytesIO
-from typing import Any, List, Dict, Optional
-
-try:
-    import pandas as pd
-    HAS_PANDAS = True
-except ImportError:
-    HAS_PANDAS = False
-
-logger = logging.getLogger(__name__)
-
-
-class S3Handler:
-    """
-    Utility class for S3 operations.
-
-    Handles common patterns like reading gzipped JSON and writing Parquet.
-
-    Args:
-        bucket: S3 bucket name
-        validate: Whether to validate bucket exists on init (default: True)
-
-    Example:
-        >>> handler = S3Handler("my-bucket")
-        >>> data = handler.read_gzipped_json("path/to/file.json.gz")
-        >>> handler.write_parquet(df, "output/data.parquet")
-    """
-
-    def __init__(self, bucket: str, validate: bool = True):
-        if not bucket:
-            raise ValueError("bucket cannot be empty")
-
-        self.bucket = bucket
-        self.s3_client = boto3.client('s3')
-
-        if validate:
-            self._validate_bucket()
-
-    def _validate_bucket(self):
-        """Validate bucket exists and is accessible."""
-        try:
-            self.s3_client.head_bucket(Bucket=self.bucket)
-        except botocore.exceptions.ClientError as e:
-            error_code = e.response['Error']['Code']
-            if error_code == '404':
-                raise ValueError(f"Bucket '{self.bucket}' does not exist")
-            elif error_code == '403':
-                raise ValueError(f"No permission to access bucket '{self.bucket}'")
-            raise
-
-    def read_json(self, key: str) -> Any:
-        """
-        Read JSON file from S3.
-
-        Args:
-            key: S3 object key
-
-        Returns:
-            Parsed JSON data
-        """
-        try:
-            response = self.s3_client.get_object(Bucket=self.bucket, Key=key)
-            return json.loads(response['Body'].read().decode('utf-8'))
-        except Exception as e:
-            logger.error(f"Error reading JSON from s3://{self.bucket}/{key}: {e}")
-            raise
-
-    def read_gzipped_json(self, key: str) -> Any:
-        """
-        Read and decompress gzipped JSON from S3.
-
-        Args:
-            key: S3 object key
-
-        Returns:
-            Parsed JSON data
-        """
-        try:
-            response = self.s3_client.get_object(Bucket=self.bucket, Key=key)
-            gzipped_data = response['Body'].read()
-            json_data = json.loads(gzip.decompress(gzipped_data))
-            return json_data
-        except Exception as e:
-            logger.error(f"Error reading gzipped JSON from s3://{self.bucket}/{key}: {e}")
-            raise
-
-    def write_json(self, data: Any, key: str, indent: Optional[int] = None):
-        """
-        Write JSON to S3.
-
-        Args:
-            data: Data to serialize as JSON
-            key: S3 object key
-            indent: JSON indentation (default: None for compact)
-        """
-        if not key:
-            raise ValueError("key cannot be empty")
-
-        try:
-            body = json.dumps(data, indent=indent, default=str)
-            self.s3_client.put_object(
-                Bucket=self.bucket,
-                Key=key,
-                Body=body.encode('utf-8'),
-                ContentType='application/json'
-            )
-            logger.info(f"Wrote JSON to s3://{self.bucket}/{key}")
-        except Exception as e:
-            logger.error(f"Error writing JSON to s3://{self.bucket}/{key}: {e}")
-            raise
-
-    def write_parquet(self, df: 'pd.DataFrame', key: str):
-        """
-        Write DataFrame to S3 as Parquet.
-
-        Requires pandas and pyarrow to be installed.
-
-        Args:
-            df: Pandas DataFrame
-            key: S3 object key
-        """
-        if not HAS_PANDAS:
-            raise ImportError("pandas is required for write_parquet")
-        if df.empty:
-            raise ValueError("Cannot write empty DataFrame")
-        if not key:
-            raise ValueError("key cannot be empty")
-
-        try:
-            buffer = BytesIO()
-            df.to_parquet(buffer, engine="pyarrow")
-            self.s3_client.put_object(
-                Bucket=self.bucket,
-                Key=key,
-                Body=buffer.getvalue()
-            )
-            logger.info(f"Wrote Parquet ({len(df)} rows) to s3://{self.bucket}/{key}")
-        except Exception as e:
-            logger.error(f"Error writing Parquet to s3://{self.bucket}/{key}: {e}")
-            raise
-
-    def list_objects(self, prefix: str = "", max_keys: int = 1000) -> List[str]:
-        """
-        List objects in bucket with optional prefix.
-
-        Args:
-            prefix: Key prefix to filter by
-            max_keys: Maximum number of keys to return
-
-        Returns:
-            List of object keys
-        """
-        try:
-            paginator = self.s3_client.get_paginator('list_objects_v2')
-            keys = []
-
-            for page in paginator.paginate(
-                Bucket=self.bucket,
-                Prefix=prefix,
-                PaginationConfig={'MaxItems': max_keys}
-            ):
-                for obj in page.get('Contents', []):
-                    keys.append(obj['Key'])
-
-            return keys
-        except Exception as e:
-            logger.error(f"Error listing objects in s3://{self.bucket}/{prefix}: {e}")
-            raise
-
-    def get_object_metadata(self, key: str) -> Dict[str, Any]:
-        """
-        Get object metadata without downloading the object.
-
-        Args:
-            key: S3 object key
-
-        Returns:
-            Dict with metadata including LastModified, ContentLength, etc.
-        """
-        try:
-            response = self.s3_client.head_object(Bucket=self.bucket, Key=key)
-            return {
-                'LastModified': response['LastModified'],
-                'ContentLength': response['ContentLength'],
-                'ContentType': response.get('ContentType'),
-                'ETag': response['ETag'],
-                'Metadata': response.get('Metadata', {})
-            }
-        except Exception as e:
-            logger.error(f"Error getting metadata for s3://{self.bucket}/{key}: {e}")
-            raise
+"""S3 utilities for reading and writing data."""
+import boto3
+import botocore
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+import gzip
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, List, Dict, Optional, Union
+
+from common import jsonio
+
+try:
+    import pandas as pd
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+
+logger = logging.getLogger(__name__)
+
+
+class S3Handler:
+    """
+    Utility class for S3 operations.
+
+    Handles common patterns like reading gzipped JSON and writing Parquet.
+
+    Clients are shared between handlers with the same client settings, so
+    creating many handlers doesn't rebuild a boto3 client each time.
+
+    Args:
+        bucket: S3 bucket name
+        validate: Whether to validate bucket exists on init (default: True)
+        max_pool_connections: Size of the client's HTTP connection pool. Must
+            cover read_many and multipart transfer concurrency (default: 64)
+
+    Example:
+        >>> handler = S3Handler("my-bucket")
+        >>> data = handler.read_gzipped_json("path/to/file.json.gz")
+        >>> handler.write_parquet(df, "output/data.parquet")
+    """
+
+    # Objects larger than this are transferred in parallel parts
+    # (byte-range GETs on read, multipart upload on write)
+    MULTIPART_THRESHOLD = 8 * 1024 * 1024
+    MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+    MULTIPART_CONCURRENCY = 16
+
+    # botocore Config options applied to every client (see configure_defaults)
+    _client_defaults: Dict[str, Any] = {
+        'retries': {'max_attempts': 10, 'mode': 'adaptive'},
+        'tcp_keepalive': True,
+    }
+    _client_cache: Dict[int, Any] = {}
+
+    def __init__(self, bucket: str, validate: bool = True, max_pool_connections: int = 64):
+        if not bucket:
+            raise ValueError("bucket cannot be empty")
+
+        self.bucket = bucket
+        self.s3_client = self._get_client(max_pool_connections)
+
+        if validate:
+            self._validate_bucket()
+
+    @classmethod
+    def configure_defaults(cls, **config: Any):
+        """
+        Set botocore Config options used for clients created afterwards.
+
+        Options are merged into the existing defaults, and cached clients are
+        discarded so new handlers pick the settings up.
+
+        Example:
+            >>> S3Handler.configure_defaults(region_name="eu-west-1", read_timeout=120)
+        """
+        cls._client_defaults = {**cls._client_defaults, **config}
+        cls._client_cache = {}
+
+    @classmethod
+    def _get_client(cls, max_pool_connections: int):
+        """Return a shared S3 client for the given pool size."""
+        client = cls._client_cache.get(max_pool_connections)
+        if client is None:
+            config = Config(max_pool_connections=max_pool_connections, **cls._client_defaults)
+            client = boto3.client('s3', config=config)
+            cls._client_cache[max_pool_connections] = client
+        return client
+
+    def _validate_bucket(self):
+        """Validate bucket exists and is accessible."""
+        try:
+            self.s3_client.head_bucket(Bucket=self.bucket)
+        except botocore.exceptions.ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code == '404':
+                raise ValueError(f"Bucket '{self.bucket}' does not exist")
+            elif error_code == '403':
+                raise ValueError(f"No permission to access bucket '{self.bucket}'")
+            raise
+
+    def _get_object_bytes(
+        self,
+        key: str,
+        response: Optional[Dict[str, Any]] = None
+    ) -> Union[bytes, bytearray]:
+        """
+        Download an object's bytes, using parallel byte-range GETs if large.
+
+        The first chunk is read from the initial GET's stream while the
+        remaining ranges are fetched concurrently into a pre-sized buffer.
+        Ranged GETs are pinned to the initial ETag so a concurrent overwrite
+        fails instead of producing a mixed object.
+
+        Args:
+            key: S3 object key
+            response: An existing get_object response for key, if any
+
+        Returns:
+            The object's contents
+        """
+        if response is None:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=key)
+
+        size = response['ContentLength']
+        body = response['Body']
+        if size <= self.MULTIPART_THRESHOLD:
+            return body.read()
+
+        chunk = self.MULTIPART_CHUNKSIZE
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+
+        def fetch_range(start: int) -> None:
+            end = min(start + chunk, size)
+            part = self.s3_client.get_object(
+                Bucket=self.bucket,
+                Key=key,
+                Range=f"bytes={start}-{end - 1}",
+                IfMatch=response['ETag']
+            )
+            view[start:end] = part['Body'].read()
+
+        starts = range(chunk, size, chunk)
+        workers = min(self.MULTIPART_CONCURRENCY, len(starts))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(fetch_range, start) for start in starts]
+
+            offset = 0
+            while offset < chunk:
+                data = body.read(chunk - offset)
+                if not data:
+                    break
+                view[offset:offset + len(data)] = data
+                offset += len(data)
+            body.close()
+
+            for future in futures:
+                future.result()
+
+        return buffer
+
+    def read_json(self, key: str) -> Any:
+        """
+        Read JSON file from S3.
+
+        Args:
+            key: S3 object key
+
+        Returns:
+            Parsed JSON data
+        """
+        try:
+            return jsonio.loads(self._get_object_bytes(key))
+        except Exception as e:
+            logger.error(f"Error reading JSON from s3://{self.bucket}/{key}: {e}")
+            raise
+
+    def read_gzipped_json(self, key: str) -> Any:
+        """
+        Read and decompress gzipped JSON from S3.
+
+        Small objects are decompressed as they stream from S3, so the
+        compressed payload is never held in memory alongside the decompressed
+        one. Large objects are downloaded with parallel byte-range GETs first.
+
+        Args:
+            key: S3 object key
+
+        Returns:
+            Parsed JSON data
+        """
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=key)
+            if response['ContentLength'] > self.MULTIPART_THRESHOLD:
+                gzipped_data = self._get_object_bytes(key, response)
+                return jsonio.loads(gzip.decompress(gzipped_data))
+
+            with gzip.GzipFile(fileobj=response['Body'], mode='rb') as gz:
+                json_data = jsonio.loads(gz.read())
+            return json_data
+        except Exception as e:
+            logger.error(f"Error reading gzipped JSON from s3://{self.bucket}/{key}: {e}")
+            raise
+
+    def read_many(
+        self,
+        keys: List[str],
+        gzipped: bool = True,
+        max_concurrency: int = 32
+    ) -> List[Any]:
+        """
+        Read many JSON objects from S3 concurrently.
+
+        Fetches run on a bounded thread pool, which helps most for many small
+        objects where per-request latency dominates. Concurrency beyond the
+        handler's max_pool_connections queues on the connection pool.
+
+        Args:
+            keys: S3 object keys
+            gzipped: Whether the objects are gzipped JSON (default: True)
+            max_concurrency: Maximum number of objects fetched at once
+
+        Returns:
+            Parsed JSON data for each key, in the same order as keys
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        read = self.read_gzipped_json if gzipped else self.read_json
+        if len(keys) <= 1:
+            return [read(key) for key in keys]
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(keys))) as executor:
+            return list(executor.map(read, keys))
+
+    def write_json(self, data: Any, key: str, indent: Optional[int] = None):
+        """
+        Write JSON to S3.
+
+        Args:
+            data: Data to serialize as JSON
+            key: S3 object key
+            indent: JSON indentation (default: None for compact)
+        """
+        if not key:
+            raise ValueError("key cannot be empty")
+
+        try:
+            body = jsonio.dumps(data, indent=indent)
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body=body,
+                ContentType='application/json'
+            )
+            logger.info(f"Wrote JSON to s3://{self.bucket}/{key}")
+        except Exception as e:
+            logger.error(f"Error writing JSON to s3://{self.bucket}/{key}: {e}")
+            raise
+
+    def write_parquet(self, df: 'pd.DataFrame', key: str):
+        """
+        Write DataFrame to S3 as Parquet.
+
+        Requires pandas and pyarrow to be installed.
+
+        Args:
+            df: Pandas DataFrame
+            key: S3 object key
+        """
+        if not HAS_PANDAS:
+            raise ImportError("pandas is required for write_parquet")
+        if df.empty:
+            raise ValueError("Cannot write empty DataFrame")
+        if not key:
+            raise ValueError("key cannot be empty")
+
+        try:
+            buffer = BytesIO()
+            df.to_parquet(buffer, engine="pyarrow")
+            buffer.seek(0)
+            # Upload straight from the buffer (no getvalue() copy), split into
+            # concurrent multipart parts once it passes the threshold
+            self.s3_client.upload_fileobj(
+                buffer,
+                self.bucket,
+                key,
+                Config=TransferConfig(
+                    multipart_threshold=self.MULTIPART_THRESHOLD,
+                    multipart_chunksize=self.MULTIPART_CHUNKSIZE,
+                    max_concurrency=self.MULTIPART_CONCURRENCY
+                )
+            )
+            logger.info(f"Wrote Parquet ({len(df)} rows) to s3://{self.bucket}/{key}")
+        except Exception as e:
+            logger.error(f"Error writing Parquet to s3://{self.bucket}/{key}: {e}")
+            raise
+
+    def list_objects(self, prefix: str = "", max_keys: int = 1000) -> List[str]:
+        """
+        List objects in bucket with optional prefix.
+
+        Args:
+            prefix: Key prefix to filter by
+            max_keys: Maximum number of keys to return
+
+        Returns:
+            List of object keys
+        """
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            keys = []
+
+            for page in paginator.paginate(
+                Bucket=self.bucket,
+                Prefix=prefix,
+                PaginationConfig={'MaxItems': max_keys}
+            ):
+                for obj in page.get('Contents', []):
+                    keys.append(obj['Key'])
+
+            return keys
+        except Exception as e:
+            logger.error(f"Error listing objects in s3://{self.bucket}/{prefix}: {e}")
+            raise
+
+    def get_object_metadata(self, key: str) -> Dict[str, Any]:
+        """
+        Get object metadata without downloading the object.
+
+        Args:
+            key: S3 object key
+
+        Returns:
+            Dict with metadata including LastModified, ContentLength, etc.
+        """
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket, Key=key)
+            return {
+                'LastModified': response['LastModified'],
+                'ContentLength': response['ContentLength'],
+                'ContentType': response.get('ContentType'),
+                'ETag': response['ETag'],
+                'Metadata': response.get('Metadata', {})
+            }
+        except Exception as e:
+            logger.error(f"Error getting metadata for s3://{self.bucket}/{key}: {e}")
+            raise
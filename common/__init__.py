@@ -1,4 +1,4 @@
-"""Common utilities shared across rowhouse modules."""
-from .paths import PathExtractor, extract_paths
-
-__all__ = ['PathExtractor', 'extract_paths']
+"""Common utilities shared across rowhouse modules."""
+from .paths import PathExtractor, extract_paths, path_getter
+
+__all__ = ['PathExtractor', 'extract_paths', 'path_getter']
@@ -0,0 +1,75 @@
+"""
+JSON encoding and decoding helpers.
+
+Uses orjson when it is installed, which parses bytes directly and is several
+times faster than the stdlib on large payloads. Falls back to the stdlib json
+module otherwise.
+"""
+import json
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """
+    Parse a JSON document from bytes or str.
+
+    Inputs orjson rejects but the stdlib accepts (NaN/Infinity literals) are
+    retried with the stdlib parser. Note that orjson reads integers wider
+    than 64 bits as floats.
+
+    Args:
+        data: UTF-8 encoded JSON bytes, or a str.
+
+    Returns:
+        Parsed JSON data.
+    """
+    if HAS_ORJSON:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dumps(
+    data: Any,
+    indent: Optional[int] = None,
+    default: Optional[Callable[[Any], Any]] = str,
+) -> bytes:
+    """
+    Serialize data to UTF-8 encoded JSON bytes.
+
+    With orjson, the bytes are produced directly instead of building a str
+    and encoding it. Datetimes and dataclasses are passed to ``default`` as
+    the stdlib does, so output matches apart from whitespace and NaN/Infinity
+    (written as null by orjson). orjson only supports an indent of 2; other
+    indents use the stdlib.
+
+    Args:
+        data: Data to serialize.
+        indent: JSON indentation (None for compact output).
+        default: Called for objects that aren't natively serializable.
+
+    Returns:
+        JSON document as bytes.
+    """
+    if HAS_ORJSON and indent in (None, 2):
+        option = (
+            orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+        )
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=default, option=option)
+
+    return json.dumps(data, indent=indent, default=default).encode('utf-8')
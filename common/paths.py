@@ -1,174 +1,252 @@
-"""
-Path extraction utilities for JSON documents.
-
-Extracts all paths from nested JSON structures, handling arrays and nested objects.
-Used by both unfurl (for field mapping) and inspect (for structure analysis).
-"""
-from typing import Any
-
-
-class PathExtractor:
-    """
-    Extracts all unique paths from JSON documents.
-
-    Paths use dot notation for nested objects and [] for arrays:
-        - "header.action" - nested object
-        - "body.items[].sku" - array of objects
-        - "data.tags[]" - array of primitives
-
-    Example:
-        >>> extractor = PathExtractor()
-        >>> doc = {"header": {"action": "test"}, "items": [{"sku": "A"}]}
-        >>> paths = extractor.extract(doc)
-        >>> print(paths)
-        {'header.action', 'items[].sku'}
-    """
-
-    def __init__(self, include_array_indices: bool = False):
-        """
-        Initialize PathExtractor.
-
-        Args:
-            include_array_indices: If True, include array index in path (items[0].sku).
-                                  If False (default), use [] notation (items[].sku).
-        """
-        self.include_array_indices = include_array_indices
-
-    def extract(self, document: dict) -> set[str]:
-        """
-        Extract all paths from a JSON document.
-
-        Args:
-            document: JSON document as a dict.
-
-        Returns:
-            Set of all paths in the document.
-        """
-        paths = set()
-        self._extract_recursive(document, "", paths)
-        return paths
-
-    def _extract_recursive(self, data: Any, current_path: str, paths: set) -> None:
-        """Recursively extract paths from nested structures."""
-        if isinstance(data, dict):
-            for key, value in data.items():
-                new_path = f"{current_path}.{key}" if current_path else key
-                if isinstance(value, (dict, list)):
-                    self._extract_recursive(value, new_path, paths)
-                else:
-                    # Leaf value - add the path
-                    paths.add(new_path)
-
-        elif isinstance(data, list):
-            if not data:
-                # Empty array - still record the path
-                paths.add(f"{current_path}[]")
-                return
-
-            # Check if array contains dicts, primitives, or mixed
-            has_dicts = any(isinstance(item, dict) for item in data)
-            has_primitives = any(not isinstance(item, (dict, list)) for item in data)
-
-            if has_primitives and not has_dicts:
-                # Array of primitives
-                paths.add(f"{current_path}[]")
-            else:
-                # Array of objects (or mixed) - recurse into each
-                for i, item in enumerate(data):
-                    if self.include_array_indices:
-                        array_path = f"{current_path}[{i}]"
-                    else:
-                        array_path = f"{current_path}[]"
-
-                    if isinstance(item, dict):
-                        self._extract_recursive(item, array_path, paths)
-                    elif isinstance(item, list):
-                        self._extract_recursive(item, array_path, paths)
-                    else:
-                        # Primitive in array
-                        paths.add(f"{current_path}[]")
-
-    def extract_with_values(self, document: dict) -> dict[str, list[Any]]:
-        """
-        Extract paths along with their values.
-
-        Useful for understanding the data at each path.
-
-        Args:
-            document: JSON document as a dict.
-
-        Returns:
-            Dict mapping paths to lists of values found at that path.
-        """
-        path_values: dict[str, list[Any]] = {}
-        self._extract_values_recursive(document, "", path_values)
-        return path_values
-
-    def _extract_values_recursive(
-        self, data: Any, current_path: str, path_values: dict[str, list[Any]]
-    ) -> None:
-        """Recursively extract paths and their values."""
-        if isinstance(data, dict):
-            for key, value in data.items():
-                new_path = f"{current_path}.{key}" if current_path else key
-                if isinstance(value, (dict, list)):
-                    self._extract_values_recursive(value, new_path, path_values)
-                else:
-                    # Leaf value
-                    if new_path not in path_values:
-                        path_values[new_path] = []
-                    path_values[new_path].append(value)
-
-        elif isinstance(data, list):
-            array_path = f"{current_path}[]"
-
-            for item in data:
-                if isinstance(item, dict):
-                    self._extract_values_recursive(item, array_path, path_values)
-                elif isinstance(item, list):
-                    self._extract_values_recursive(item, array_path, path_values)
-                else:
-                    # Primitive in array
-                    if array_path not in path_values:
-                        path_values[array_path] = []
-                    path_values[array_path].append(item)
-
-    def get_value_at_path(self, document: dict, path: str) -> Any:
-        """
-        Get the value at a specific path in a document.
-
-        Args:
-            document: JSON document.
-            path: Dot-notation path (e.g., "header.action").
-
-        Returns:
-            Value at the path, or None if not found.
-        """
-        parts = path.replace("[]", "").split(".")
-        current = document
-
-        for part in parts:
-            if isinstance(current, dict) and part in current:
-                current = current[part]
-            elif isinstance(current, list):
-                # For arrays, we'd need index - return None for now
-                return None
-            else:
-                return None
-
-        return current
-
-
-def extract_paths(document: dict, include_array_indices: bool = False) -> set[str]:
-    """
-    Convenience function to extract paths from a document.
-
-    Args:
-        document: JSON document as a dict.
-        include_array_indices: If True, include array indices in paths.
-
-    Returns:
-        Set of all paths in the document.
-    """
-    extractor = PathExtractor(include_array_indices=include_array_indices)
-    return extractor.extract(document)
+"""
+Path extraction utilities for JSON documents.
+
+Extracts all paths from nested JSON structures, handling arrays and nested objects.
+Used by both unfurl (for field mapping) and inspect (for structure analysis).
+"""
+from typing import Any, Callable, Iterator, Optional
+
+
+class PathExtractor:
+    """
+    Extracts all unique paths from JSON documents.
+
+    Paths use dot notation for nested objects and [] for arrays:
+        - "header.action" - nested object
+        - "body.items[].sku" - array of objects
+        - "data.tags[]" - array of primitives
+
+    Example:
+        >>> extractor = PathExtractor()
+        >>> doc = {"header": {"action": "test"}, "items": [{"sku": "A"}]}
+        >>> paths = extractor.extract(doc)
+        >>> print(paths)
+        {'header.action', 'items[].sku'}
+    """
+
+    def __init__(self, include_array_indices: bool = False):
+        """
+        Initialize PathExtractor.
+
+        Args:
+            include_array_indices: If True, include array index in path (items[0].sku).
+                                  If False (default), use [] notation (items[].sku).
+        """
+        self.include_array_indices = include_array_indices
+
+    def extract(self, document: dict) -> set[str]:
+        """
+        Extract all paths from a JSON document.
+
+        Walks the document with an explicit stack rather than recursion, so
+        deeply nested documents don't pay a Python call frame per node.
+
+        Args:
+            document: JSON document as a dict.
+
+        Returns:
+            Set of all paths in the document.
+        """
+        paths: set[str] = set()
+        include_indices = self.include_array_indices
+        stack: list[tuple[Any, str]] = [(document, "")]
+        # Bound locally: this loop runs once per node of every document
+        add_path = paths.add
+        push = stack.append
+        pop = stack.pop
+        containers = (dict, list)
+
+        while stack:
+            data, current_path = pop()
+
+            if isinstance(data, dict):
+                prefix = f"{current_path}." if current_path else ""
+                for key, value in data.items():
+                    if isinstance(value, containers):
+                        push((value, f"{prefix}{key}"))
+                    else:
+                        # Leaf value - add the path
+                        add_path(f"{prefix}{key}")
+
+            elif isinstance(data, list):
+                array_path = f"{current_path}[]"
+                if not data:
+                    # Empty array - still record the path
+                    add_path(array_path)
+                    continue
+
+                # Single pass: classify items and collect nested containers
+                has_dicts = False
+                has_primitives = False
+                nested = []
+                for i, item in enumerate(data):
+                    if isinstance(item, dict):
+                        has_dicts = True
+                        nested.append((i, item))
+                    elif isinstance(item, list):
+                        nested.append((i, item))
+                    else:
+                        has_primitives = True
+
+                if has_primitives:
+                    # Array of primitives (or primitives mixed into objects)
+                    add_path(array_path)
+                    if not has_dicts:
+                        continue
+
+                # Array of objects (or mixed) - descend into each container
+                if include_indices:
+                    for i, item in nested:
+                        push((item, f"{current_path}[{i}]"))
+                else:
+                    for _, item in nested:
+                        push((item, array_path))
+
+        return paths
+
+    def extract_scalar_leaves(
+        self, document: dict, max_depth: Optional[int] = None
+    ) -> Iterator[tuple[str, Any]]:
+        """
+        Yield (path, value) for every scalar leaf outside of arrays.
+
+        Only descends through nested objects, so array contents are skipped.
+        Useful for scanning candidate fields in a single pass per document.
+
+        Args:
+            document: JSON document as a dict.
+            max_depth: Only yield leaves at this depth or shallower
+                      ("header.action" has depth 2). None means unlimited.
+
+        Yields:
+            Tuples of (path, value) for each non-null scalar leaf.
+        """
+        stack: list[tuple[dict, str, int]] = [(document, "", 1)]
+
+        while stack:
+            data, prefix, depth = stack.pop()
+            for key, value in data.items():
+                if isinstance(value, dict):
+                    if max_depth is None or depth < max_depth:
+                        stack.append((value, f"{prefix}{key}.", depth + 1))
+                elif value is not None and not isinstance(value, list):
+                    yield f"{prefix}{key}", value
+
+    def extract_with_values(self, document: dict) -> dict[str, list[Any]]:
+        """
+        Extract paths along with their values.
+
+        Useful for understanding the data at each path.
+
+        Args:
+            document: JSON document as a dict.
+
+        Returns:
+            Dict mapping paths to lists of values found at that path.
+        """
+        path_values: dict[str, list[Any]] = {}
+        self._extract_values_recursive(document, "", path_values)
+        return path_values
+
+    def _extract_values_recursive(
+        self, data: Any, current_path: str, path_values: dict[str, list[Any]]
+    ) -> None:
+        """Recursively extract paths and their values."""
+        if isinstance(data, dict):
+            for key, value in data.items():
+                new_path = f"{current_path}.{key}" if current_path else key
+                if isinstance(value, (dict, list)):
+                    self._extract_values_recursive(value, new_path, path_values)
+                else:
+                    # Leaf value
+                    if new_path not in path_values:
+                        path_values[new_path] = []
+                    path_values[new_path].append(value)
+
+        elif isinstance(data, list):
+            array_path = f"{current_path}[]"
+
+            for item in data:
+                if isinstance(item, dict):
+                    self._extract_values_recursive(item, array_path, path_values)
+                elif isinstance(item, list):
+                    self._extract_values_recursive(item, array_path, path_values)
+                else:
+                    # Primitive in array
+                    if array_path not in path_values:
+                        path_values[array_path] = []
+                    path_values[array_path].append(item)
+
+    def get_value_at_path(self, document: dict, path: str) -> Any:
+        """
+        Get the value at a specific path in a document.
+
+        Args:
+            document: JSON document.
+            path: Dot-notation path (e.g., "header.action").
+
+        Returns:
+            Value at the path, or None if not found.
+        """
+        parts = path.replace("[]", "").split(".")
+        current = document
+
+        for part in parts:
+            if isinstance(current, dict) and part in current:
+                current = current[part]
+            elif isinstance(current, list):
+                # For arrays, we'd need index - return None for now
+                return None
+            else:
+                return None
+
+        return current
+
+
+def path_getter(path: str) -> Callable[[Any], Any]:
+    """
+    Build a function that reads the value at a path from a document.
+
+    Equivalent to PathExtractor.get_value_at_path, but the path is split once
+    up front, so the returned function is cheap to call once per document.
+
+    Args:
+        path: Dot-notation path (e.g., "header.action").
+
+    Returns:
+        Function mapping a document to the value at the path, or None.
+    """
+    parts = tuple(path.replace("[]", "").split("."))
+
+    if len(parts) == 1:
+        key = parts[0]
+
+        def get_flat(document: Any) -> Any:
+            return document.get(key) if isinstance(document, dict) else None
+
+        return get_flat
+
+    def get_nested(document: Any) -> Any:
+        current = document
+        for part in parts:
+            if not isinstance(current, dict):
+                return None
+            current = current.get(part)
+        return current
+
+    return get_nested
+
+
+def extract_paths(document: dict, include_array_indices: bool = False) -> set[str]:
+    """
+    Convenience function to extract paths from a document.
+
+    Args:
+        document: JSON document as a dict.
+        include_array_indices: If True, include array indices in paths.
+
+    Returns:
+        Set of all paths in the document.
+    """
+    extractor = PathExtractor(include_array_indices=include_array_indices)
+    return extractor.extract(document)
@@ -0,0 +1,57 @@
+"""
+Numba kernel for Jaccard similarity over packed bitsets.
+
+Compiled when numba is installed; discover.bitsets falls back to NumPy
+broadcasting otherwise. The kernel walks the words of each pair once,
+without the (rows, M, W) temporaries the NumPy path allocates, and splits
+rows across cores with prange.
+"""
+import numpy as np
+
+try:
+    import numba
+    from numba import prange, types
+    from numba.extending import intrinsic
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+if HAS_NUMBA:
+    @intrinsic
+    def _popcount64(typingctx, word):
+        """Count set bits in a uint64 with LLVM's ctpop (a single POPCNT)."""
+        sig = types.uint64(types.uint64)
+
+        def codegen(context, builder, signature, args):
+            return builder.ctpop(args[0])
+
+        return sig, codegen
+
+    @numba.njit(parallel=True, cache=True)
+    def _jaccard_pairs(bits_a, bits_b, symmetric):
+        n, m, n_words = bits_a.shape[0], bits_b.shape[0], bits_a.shape[1]
+        out = np.empty((n, m), np.float64)
+        for i in prange(n):
+            # For a matrix against itself only the upper triangle is computed
+            start = i if symmetric else 0
+            for j in range(start, m):
+                inter = 0
+                union = 0
+                for k in range(n_words):
+                    a = bits_a[i, k]
+                    b = bits_b[j, k]
+                    inter += _popcount64(a & b)
+                    union += _popcount64(a | b)
+                value = inter / union if union else 1.0
+                out[i, j] = value
+                if symmetric:
+                    out[j, i] = value
+        return out
+
+    def jaccard_matrix(bits_a: np.ndarray, bits_b: np.ndarray) -> np.ndarray:
+        """Jaccard similarity between every row of bits_a and of bits_b."""
+        symmetric = bits_a is bits_b
+        bits_a = np.ascontiguousarray(bits_a, dtype=np.uint64)
+        bits_b = bits_a if symmetric else np.ascontiguousarray(bits_b, dtype=np.uint64)
+        return _jaccard_pairs(bits_a, bits_b, symmetric)
@@ -1,406 +1,732 @@
-"""
-Structure analyzer for JSON documents.
-
-Analyzes collections of JSON documents to discover structural patterns
-and identify splitter fields that determine document structure.
-"""
-from dataclasses import dataclass, field
-from typing import Any, Callable, Optional
-from itertools import combinations
-from collections import defaultdict
-
-from common.paths import PathExtractor
-from .similarity import SimilarityStrategy, JaccardPathSimilarity
-
-
-@dataclass
-class SplitterResult:
-    """Result of evaluating a candidate splitter field."""
-
-    field: str
-    """Path to the splitter field (e.g., 'header.action')"""
-
-    score: float
-    """Splitter score: within-group similarity / between-group similarity.
-    Higher scores indicate better splitters."""
-
-    distinct_values: int
-    """Number of distinct values for this field."""
-
-    coverage: float
-    """Fraction of documents that have this field (0-1)."""
-
-    value_counts: dict[str, int] = field(default_factory=dict)
-    """Count of documents for each distinct value."""
-
-    within_similarity: float = 0.0
-    """Average similarity within groups."""
-
-    between_similarity: float = 0.0
-    """Average similarity between groups."""
-
-    def __repr__(self) -> str:
-        return (
-            f"SplitterResult(field='{self.field}', score={self.score:.2f}, "
-            f"values={self.distinct_values}, coverage={self.coverage:.1%})"
-        )
-
-
-@dataclass
-class StructureSummary:
-    """Summary of document structure for a specific splitter value."""
-
-    value: str
-    """The splitter value."""
-
-    count: int
-    """Number of documents with this value."""
-
-    unique_paths: set[str]
-    """All unique paths in documents with this value."""
-
-    common_paths: set[str]
-    """Paths that appear in ALL documents with this value."""
-
-    sample_paths: list[str]
-    """Representative sample of paths (for display)."""
-
-
-class StructureAnalyzer:
-    """
-    Analyzes JSON document structure and discovers splitter fields.
-
-    A splitter field is one whose value determines the structure of the rest
-    of the document. For example, if documents with header.action="OrderCreated"
-    always have body.items[], while documents with header.action="UserCreated"
-    always have body.user.*, then header.action is a good splitter.
-
-    Example:
-        >>> analyzer = StructureAnalyzer()
-        >>> results = analyzer.find_splitters(documents)
-        >>> print(results[0])
-        SplitterResult(field='header.action', score=3.76, values=5, coverage=100.0%)
-
-        >>> # Use the best splitter with JsonProcessor
-        >>> best = results[0]
-        >>> processor = JsonProcessor(split_path=best.field.split('.'), config)
-    """
-
-    def __init__(
-        self,
-        similarity_strategy: Optional[SimilarityStrategy] = None,
-        path_extractor: Optional[PathExtractor] = None,
-    ):
-        """
-        Initialize StructureAnalyzer.
-
-        Args:
-            similarity_strategy: Strategy for comparing document structures.
-                               Defaults to JaccardPathSimilarity.
-            path_extractor: Extractor for getting paths from documents.
-                          Defaults to standard PathExtractor.
-        """
-        self.similarity = similarity_strategy or JaccardPathSimilarity()
-        self.extractor = path_extractor or PathExtractor()
-
-    def find_splitters(
-        self,
-        documents: list[dict],
-        # Grouping options
-        grouping_field: Optional[str] = None,
-        grouping_fields: Optional[list[str]] = None,
-        grouping_fn: Optional[Callable[[dict], Any]] = None,
-        # Auto-detection settings
-        auto_detect: bool = True,
-        max_cardinality: int = 50,
-        min_coverage: float = 0.5,
-        max_depth: int = 3,
-    ) -> list[SplitterResult]:
-        """
-        Find and evaluate splitter fields in a document collection.
-
-        Args:
-            documents: List of JSON documents to analyze.
-            grouping_field: Specific field to evaluate as splitter.
-            grouping_fields: Multiple fields to combine as composite splitter.
-            grouping_fn: Custom function to extract grouping key from document.
-            auto_detect: If True (default), automatically find candidate splitters.
-            max_cardinality: Skip fields with more than this many distinct values.
-            min_coverage: Field must appear in at least this fraction of docs.
-            max_depth: Only consider fields at this depth or shallower.
-
-        Returns:
-            List of SplitterResult, sorted by score (best first).
-        """
-        if not documents:
-            return []
-
-        # Extract paths for all documents
-        doc_paths = [self.extractor.extract(doc) for doc in documents]
-
-        # Determine which fields to evaluate
-        if grouping_field:
-            candidates = [grouping_field]
-        elif grouping_fields:
-            # Composite key - combine fields
-            candidates = [".".join(grouping_fields)]
-            grouping_fn = self._make_composite_fn(grouping_fields)
-        elif grouping_fn:
-            # Custom function provided - evaluate it directly
-            return [self._evaluate_grouping(
-                documents, doc_paths, grouping_fn, "custom"
-            )]
-        elif auto_detect:
-            candidates = self._find_candidate_fields(
-                documents, doc_paths, max_cardinality, min_coverage, max_depth
-            )
-        else:
-            return []
-
-        # Evaluate each candidate
-        results = []
-        for candidate in candidates:
-            fn = self._make_field_fn(candidate)
-            result = self._evaluate_grouping(documents, doc_paths, fn, candidate)
-            if result.score > 0:
-                results.append(result)
-
-        # Sort by score (best first)
-        results.sort(key=lambda r: r.score, reverse=True)
-        return results
-
-    def _find_candidate_fields(
-        self,
-        documents: list[dict],
-        doc_paths: list[set[str]],
-        max_cardinality: int,
-        min_coverage: float,
-        max_depth: int,
-    ) -> list[str]:
-        """Find fields that could be good splitters."""
-        # Get all leaf paths (non-array) that are shallow enough
-        all_paths: set[str] = set()
-        for paths in doc_paths:
-            for path in paths:
-                # Skip array paths - we want scalar values
-                if "[]" not in path:
-                    depth = path.count(".") + 1
-                    if depth <= max_depth:
-                        all_paths.add(path)
-
-        # Filter by coverage and cardinality
-        candidates = []
-        for path in all_paths:
-            values = []
-            present_count = 0
-
-            for doc in documents:
-                value = self.extractor.get_value_at_path(doc, path)
-                if value is not None:
-                    present_count += 1
-                    values.append(value)
-
-            coverage = present_count / len(documents)
-            if coverage < min_coverage:
-                continue
-
-            distinct = len(set(str(v) for v in values))
-            if distinct > max_cardinality:
-                continue
-
-            # Must have at least 2 distinct values to be a splitter
-            if distinct >= 2:
-                candidates.append(path)
-
-        return candidates
-
-    def _make_field_fn(self, field_path: str) -> Callable[[dict], Any]:
-        """Create a grouping function for a field path."""
-        def fn(doc: dict) -> Any:
-            return self.extractor.get_value_at_path(doc, field_path)
-        return fn
-
-    def _make_composite_fn(self, field_paths: list[str]) -> Callable[[dict], Any]:
-        """Create a grouping function for multiple fields."""
-        def fn(doc: dict) -> Any:
-            values = tuple(
-                self.extractor.get_value_at_path(doc, p)
-                for p in field_paths
-            )
-            return values
-        return fn
-
-    def _evaluate_grouping(
-        self,
-        documents: list[dict],
-        doc_paths: list[set[str]],
-        grouping_fn: Callable[[dict], Any],
-        field_name: str,
-    ) -> SplitterResult:
-        """Evaluate a specific grouping as a potential splitter."""
-        # Group documents by the grouping function
-        groups: dict[Any, list[int]] = defaultdict(list)
-        present_count = 0
-
-        for i, doc in enumerate(documents):
-            value = grouping_fn(doc)
-            if value is not None:
-                groups[str(value)].append(i)
-                present_count += 1
-
-        coverage = present_count / len(documents) if documents else 0
-        distinct_values = len(groups)
-        value_counts = {k: len(v) for k, v in groups.items()}
-
-        # Calculate within-group similarity
-        within_sims = []
-        for indices in groups.values():
-            if len(indices) >= 2:
-                group_paths = [doc_paths[i] for i in indices]
-                for p1, p2 in combinations(group_paths, 2):
-                    within_sims.append(self.similarity.similarity(p1, p2))
-
-        within_avg = sum(within_sims) / len(within_sims) if within_sims else 1.0
-
-        # Calculate between-group similarity
-        between_sims = []
-        group_keys = list(groups.keys())
-        if len(group_keys) >= 2:
-            for g1, g2 in combinations(group_keys, 2):
-                # Sample one from each group for comparison
-                idx1 = groups[g1][0]
-                idx2 = groups[g2][0]
-                between_sims.append(
-                    self.similarity.similarity(doc_paths[idx1], doc_paths[idx2])
-                )
-
-        between_avg = sum(between_sims) / len(between_sims) if between_sims else 0.001
-
-        # Score = within / between (higher = better splitter)
-        score = within_avg / between_avg if between_avg > 0 else within_avg
-
-        return SplitterResult(
-            field=field_name,
-            score=score,
-            distinct_values=distinct_values,
-            coverage=coverage,
-            value_counts=value_counts,
-            within_similarity=within_avg,
-            between_similarity=between_avg,
-        )
-
-    def describe(
-        self,
-        documents: list[dict],
-        splitter: Optional[str] = None,
-        top_n: int = 5,
-    ) -> str:
-        """
-        Generate a human-readable structure summary.
-
-        Args:
-            documents: List of JSON documents.
-            splitter: Specific splitter to use. If None, auto-detects.
-            top_n: Number of top splitters to show.
-
-        Returns:
-            Formatted string describing the structure.
-        """
-        if not documents:
-            return "No documents to analyze."
-
-        doc_paths = [self.extractor.extract(doc) for doc in documents]
-        all_paths = set().union(*doc_paths)
-
-        lines = [
-            f"Documents analyzed: {len(documents):,}",
-            f"Unique paths: {len(all_paths)}",
-            "",
-        ]
-
-        # Find splitters
-        results = self.find_splitters(documents)
-        if results:
-            lines.append("Candidate splitters:")
-            for i, r in enumerate(results[:top_n]):
-                marker = " ← RECOMMENDED" if i == 0 else ""
-                lines.append(
-                    f"  {r.field} ({r.distinct_values} values, "
-                    f"score: {r.score:.2f}){marker}"
-                )
-            lines.append("")
-
-            # Show structure by best splitter
-            best = results[0] if not splitter else next(
-                (r for r in results if r.field == splitter), results[0]
-            )
-            lines.append(f"Structure by {best.field}:")
-
-            grouping_fn = self._make_field_fn(best.field)
-            groups: dict[str, list[set[str]]] = defaultdict(list)
-
-            for doc, paths in zip(documents, doc_paths):
-                value = grouping_fn(doc)
-                if value is not None:
-                    groups[str(value)].append(paths)
-
-            for value, path_sets in sorted(groups.items(), key=lambda x: -len(x[1])):
-                common = set.intersection(*path_sets) if path_sets else set()
-                # Get paths unique to this group (not in other groups)
-                other_paths = set()
-                for other_value, other_sets in groups.items():
-                    if other_value != value:
-                        other_paths.update(*other_sets)
-                unique_to_group = set.union(*path_sets) - other_paths if path_sets else set()
-
-                # Show compact summary
-                sample = sorted(unique_to_group)[:3]
-                sample_str = ", ".join(sample)
-                if len(unique_to_group) > 3:
-                    sample_str += f" (+{len(unique_to_group) - 3} more)"
-
-                lines.append(f'  "{value}" ({len(path_sets)} docs): {sample_str or "(same as others)"}')
-
-        else:
-            lines.append("No candidate splitters found.")
-
-        return "\n".join(lines)
-
-    def get_structure_by_value(
-        self,
-        documents: list[dict],
-        splitter: str,
-    ) -> dict[str, StructureSummary]:
-        """
-        Get detailed structure information grouped by splitter value.
-
-        Args:
-            documents: List of JSON documents.
-            splitter: Field path to use as splitter.
-
-        Returns:
-            Dict mapping splitter values to StructureSummary.
-        """
-        doc_paths = [self.extractor.extract(doc) for doc in documents]
-        grouping_fn = self._make_field_fn(splitter)
-
-        groups: dict[str, list[set[str]]] = defaultdict(list)
-        for doc, paths in zip(documents, doc_paths):
-            value = grouping_fn(doc)
-            if value is not None:
-                groups[str(value)].append(paths)
-
-        summaries = {}
-        for value, path_sets in groups.items():
-            all_paths = set.union(*path_sets) if path_sets else set()
-            common_paths = set.intersection(*path_sets) if path_sets else set()
-
-            summaries[value] = StructureSummary(
-                value=value,
-                count=len(path_sets),
-                unique_paths=all_paths,
-                common_paths=common_paths,
-                sample_paths=sorted(all_paths)[:10],
-            )
-
-        return summaries
+"""
+Structure analyzer for JSON documents.
+
+Analyzes collections of JSON documents to discover structural patterns
+and identify splitter fields that determine document structure.
+"""
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Iterable, Optional, Sequence
+from itertools import combinations
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from common.paths import PathExtractor, path_getter
+from .bitsets import PathBitsetIndex
+from .similarity import (
+    SimilarityStrategy,
+    JaccardPathSimilarity,
+    mean_pairwise_similarity,
+)
+
+
+def _extract_frozen(extractor: PathExtractor, document: dict) -> frozenset[str]:
+    """Extract a document's paths; module-level so process pools can pickle it."""
+    return frozenset(extractor.extract(document))
+
+
+def sample_documents(
+    documents: Iterable[dict],
+    sample_size: int,
+    seed: int = 42,
+) -> list[dict]:
+    """
+    Draw a reproducible uniform sample of documents, keeping their order.
+
+    Sequences are sampled by index. Other iterables (generators, streams)
+    are reservoir-sampled in one pass without materializing them.
+
+    Args:
+        documents: Documents to sample from.
+        sample_size: Maximum number of documents to keep.
+        seed: Seed for the random generator.
+
+    Returns:
+        At most sample_size documents, in their original relative order.
+    """
+    rng = random.Random(seed)
+
+    if isinstance(documents, Sequence):
+        if len(documents) <= sample_size:
+            return list(documents)
+        indices = sorted(rng.sample(range(len(documents)), sample_size))
+        return [documents[i] for i in indices]
+
+    reservoir: list[tuple[int, dict]] = []
+    for i, doc in enumerate(documents):
+        if i < sample_size:
+            reservoir.append((i, doc))
+        else:
+            j = rng.randint(0, i)
+            if j < sample_size:
+                reservoir[j] = (i, doc)
+    reservoir.sort(key=lambda item: item[0])
+    return [doc for _, doc in reservoir]
+
+
+@dataclass
+class SplitterResult:
+    """Result of evaluating a candidate splitter field."""
+
+    field: str
+    """Path to the splitter field (e.g., 'header.action')"""
+
+    score: float
+    """Splitter score: within-group similarity / between-group similarity.
+    Higher scores indicate better splitters."""
+
+    distinct_values: int
+    """Number of distinct values for this field."""
+
+    coverage: float
+    """Fraction of documents that have this field (0-1)."""
+
+    value_counts: dict[str, int] = field(default_factory=dict)
+    """Count of documents for each distinct value."""
+
+    within_similarity: float = 0.0
+    """Average similarity within groups."""
+
+    between_similarity: float = 0.0
+    """Average similarity between groups."""
+
+    def __repr__(self) -> str:
+        return (
+            f"SplitterResult(field='{self.field}', score={self.score:.2f}, "
+            f"values={self.distinct_values}, coverage={self.coverage:.1%})"
+        )
+
+
+@dataclass
+class StructureSummary:
+    """Summary of document structure for a specific splitter value."""
+
+    value: str
+    """The splitter value."""
+
+    count: int
+    """Number of documents with this value."""
+
+    unique_paths: set[str]
+    """All unique paths in documents with this value."""
+
+    common_paths: set[str]
+    """Paths that appear in ALL documents with this value."""
+
+    sample_paths: list[str]
+    """Representative sample of paths (for display)."""
+
+
+class StructureAnalyzer:
+    """
+    Analyzes JSON document structure and discovers splitter fields.
+
+    A splitter field is one whose value determines the structure of the rest
+    of the document. For example, if documents with header.action="OrderCreated"
+    always have body.items[], while documents with header.action="UserCreated"
+    always have body.user.*, then header.action is a good splitter.
+
+    Example:
+        >>> analyzer = StructureAnalyzer()
+        >>> results = analyzer.find_splitters(documents)
+        >>> print(results[0])
+        SplitterResult(field='header.action', score=3.76, values=5, coverage=100.0%)
+
+        >>> # Use the best splitter with JsonProcessor
+        >>> best = results[0]
+        >>> processor = JsonProcessor(split_path=best.field.split('.'), config)
+    """
+
+    # Below this many documents, extraction stays serial even with n_workers
+    PARALLEL_MIN_DOCUMENTS = 256
+    # Collections with more distinct paths compare path sets, not bitsets
+    MAX_BITSET_PATHS = 4096
+    # Up to this many distinct structures, pairwise similarities are computed
+    # once per collection and reused for every candidate splitter
+    MAX_SIMILARITY_STRUCTURES = 2048
+
+    def __init__(
+        self,
+        similarity_strategy: Optional[SimilarityStrategy] = None,
+        path_extractor: Optional[PathExtractor] = None,
+        n_workers: Optional[int] = None,
+    ):
+        """
+        Initialize StructureAnalyzer.
+
+        Args:
+            similarity_strategy: Strategy for comparing document structures.
+                               Defaults to JaccardPathSimilarity.
+            path_extractor: Extractor for getting paths from documents.
+                          Defaults to standard PathExtractor.
+            n_workers: If greater than 1, extract paths from large collections
+                      in a process pool of this size. Documents and the
+                      extractor must be picklable.
+        """
+        self.similarity = similarity_strategy or JaccardPathSimilarity()
+        self.extractor = path_extractor or PathExtractor()
+        self.n_workers = n_workers
+        # Last extracted collection: id -> (documents, per-document path sets).
+        # Holding the list keeps its id from being reused while cached.
+        self._paths_cache: dict[int, tuple[list[dict], list[frozenset[str]]]] = {}
+        # Derived data for the last doc_paths list, each as (doc_paths, value):
+        # distinct structures, their packed bitsets, and their similarities
+        self._structures_cache: Optional[tuple[list[frozenset[str]], tuple]] = None
+        self._bitsets_cache: Optional[tuple[list[frozenset[str]], Optional[tuple]]] = None
+        self._similarity_cache: Optional[tuple[list[frozenset[str]], Optional[np.ndarray]]] = None
+
+    def _get_doc_paths(self, documents: list[dict]) -> list[frozenset[str]]:
+        """
+        Extract paths for every document, reusing the last extraction.
+
+        Calling describe() or get_structure_by_value() on the same list that
+        was just passed to find_splitters() skips re-extracting each document.
+        The cache is keyed on the list object and its length, so mutating
+        documents in place requires clear_cache().
+        """
+        cached = self._paths_cache.get(id(documents))
+        if cached is not None:
+            cached_docs, doc_paths = cached
+            if cached_docs is documents and len(doc_paths) == len(documents):
+                return doc_paths
+
+        n_workers = self.n_workers or 1
+        if n_workers > 1 and len(documents) >= self.PARALLEL_MIN_DOCUMENTS:
+            # Roughly 8 chunks per worker: few enough to amortize pickling,
+            # enough that one slow chunk doesn't leave workers idle
+            chunksize = max(1, len(documents) // (n_workers * 8))
+            extract = partial(_extract_frozen, self.extractor)
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                doc_paths = list(executor.map(extract, documents, chunksize=chunksize))
+        else:
+            doc_paths = [frozenset(self.extractor.extract(doc)) for doc in documents]
+
+        # Documents with the same structure share one path set object, so a
+        # large collection holds one copy of each distinct structure's paths
+        canonical: dict[frozenset[str], frozenset[str]] = {}
+        doc_paths = [canonical.setdefault(paths, paths) for paths in doc_paths]
+        self._paths_cache = {id(documents): (documents, doc_paths)}
+        return doc_paths
+
+    def _get_structures(
+        self, doc_paths: list[frozenset[str]]
+    ) -> tuple[list[frozenset[str]], np.ndarray]:
+        """
+        Deduplicate document structures.
+
+        Returns:
+            Tuple of (distinct path sets, row of each document's structure).
+        """
+        cached = self._structures_cache
+        if cached is not None and cached[0] is doc_paths:
+            return cached[1]
+
+        structure_rows: dict[frozenset[str], int] = {}
+        doc_rows = np.fromiter(
+            (structure_rows.setdefault(paths, len(structure_rows)) for paths in doc_paths),
+            dtype=np.intp,
+            count=len(doc_paths),
+        )
+        structures = (list(structure_rows), doc_rows)
+
+        self._structures_cache = (doc_paths, structures)
+        return structures
+
+    def _get_doc_bitsets(
+        self, doc_paths: list[frozenset[str]]
+    ) -> Optional[tuple[PathBitsetIndex, np.ndarray, np.ndarray]]:
+        """
+        Pack each distinct document structure into a uint64 bitset row.
+
+        Intersections and unions then become word-wise AND/OR with a
+        popcount, computed for many pairs at once. Returns None when the
+        collection has more than MAX_BITSET_PATHS distinct paths, where wide
+        bitsets stop paying for themselves.
+
+        Returns:
+            Tuple of (index, bits per distinct structure, structure row of
+            each document), or None.
+        """
+        cached = self._bitsets_cache
+        if cached is not None and cached[0] is doc_paths:
+            return cached[1]
+
+        structures, doc_rows = self._get_structures(doc_paths)
+        index = PathBitsetIndex()
+        packed = None
+        for paths in structures:
+            index.intern(paths)
+        if len(index) <= self.MAX_BITSET_PATHS:
+            packed = (index, index.pack(structures), doc_rows)
+
+        self._bitsets_cache = (doc_paths, packed)
+        return packed
+
+    def _get_structure_similarity(
+        self, doc_paths: list[frozenset[str]]
+    ) -> Optional[np.ndarray]:
+        """
+        Similarity between every pair of distinct document structures.
+
+        Computed once per collection and shared by every candidate splitter,
+        so no pair of structures is compared twice. Returns None when there
+        are more than MAX_SIMILARITY_STRUCTURES distinct structures.
+
+        Returns:
+            Symmetric (U, U) array indexed by structure row, or None.
+        """
+        cached = self._similarity_cache
+        if cached is not None and cached[0] is doc_paths:
+            return cached[1]
+
+        structures, _ = self._get_structures(doc_paths)
+        n = len(structures)
+        matrix = None
+        if n <= self.MAX_SIMILARITY_STRUCTURES:
+            matrix_fn = getattr(self.similarity, "bitset_similarity_matrix", None)
+            packed = self._get_doc_bitsets(doc_paths) if matrix_fn else None
+            if packed is not None:
+                index, bits, _ = packed
+                matrix = np.asarray(matrix_fn(bits, bits, index), dtype=np.float64)
+            else:
+                matrix = np.empty((n, n), dtype=np.float64)
+                for i in range(n):
+                    for j in range(i, n):
+                        matrix[i, j] = matrix[j, i] = self.similarity.similarity(
+                            structures[i], structures[j]
+                        )
+
+        self._similarity_cache = (doc_paths, matrix)
+        return matrix
+
+    def clear_cache(self) -> None:
+        """Forget previously extracted document paths."""
+        self._paths_cache = {}
+        self._structures_cache = None
+        self._bitsets_cache = None
+        self._similarity_cache = None
+
+    def find_splitters(
+        self,
+        documents: Iterable[dict],
+        # Grouping options
+        grouping_field: Optional[str] = None,
+        grouping_fields: Optional[list[str]] = None,
+        grouping_fn: Optional[Callable[[dict], Any]] = None,
+        # Auto-detection settings
+        auto_detect: bool = True,
+        max_cardinality: int = 50,
+        min_coverage: float = 0.5,
+        max_depth: int = 3,
+        sample_size: Optional[int] = None,
+        precomputed_paths: Optional[Sequence[set[str]]] = None,
+    ) -> list[SplitterResult]:
+        """
+        Find and evaluate splitter fields in a document collection.
+
+        Args:
+            documents: JSON documents to analyze. Any iterable is accepted
+                      when sample_size is set; otherwise it is read into a list.
+            grouping_field: Specific field to evaluate as splitter.
+            grouping_fields: Multiple fields to combine as composite splitter.
+            grouping_fn: Custom function to extract grouping key from document.
+            auto_detect: If True (default), automatically find candidate splitters.
+            max_cardinality: Skip fields with more than this many distinct values.
+            min_coverage: Field must appear in at least this fraction of docs.
+            max_depth: Only consider fields at this depth or shallower.
+            sample_size: If set, analyze a reproducible random sample of at
+                        most this many documents. Splitter rankings usually
+                        stabilize within a few thousand documents; coverage
+                        and value counts then describe the sample.
+            precomputed_paths: Path sets already extracted for each document,
+                              in the same order. Cannot be combined with
+                              sample_size.
+
+        Returns:
+            List of SplitterResult, sorted by score (best first).
+        """
+        if sample_size is not None:
+            if precomputed_paths is not None:
+                raise ValueError("precomputed_paths cannot be combined with sample_size")
+            documents = sample_documents(documents, sample_size)
+        elif not isinstance(documents, list):
+            documents = list(documents)
+
+        if not documents:
+            return []
+
+        # Extract paths for all documents
+        if precomputed_paths is not None:
+            if len(precomputed_paths) != len(documents):
+                raise ValueError("precomputed_paths must have one entry per document")
+            if isinstance(precomputed_paths, list) and all(
+                isinstance(paths, frozenset) for paths in precomputed_paths
+            ):
+                doc_paths = precomputed_paths
+            else:
+                doc_paths = [frozenset(paths) for paths in precomputed_paths]
+        else:
+            doc_paths = self._get_doc_paths(documents)
+
+        # Determine which fields to evaluate
+        if grouping_field:
+            candidates = [grouping_field]
+        elif grouping_fields:
+            # Composite key - combine fields
+            candidates = [".".join(grouping_fields)]
+            grouping_fn = self._make_composite_fn(grouping_fields)
+        elif grouping_fn:
+            # Custom function provided - evaluate it directly
+            return [self._evaluate_grouping(
+                documents, doc_paths, grouping_fn, "custom"
+            )]
+        elif auto_detect:
+            candidates = self._find_candidate_fields(
+                documents, max_cardinality, min_coverage, max_depth
+            )
+        else:
+            return []
+
+        # Evaluate each candidate
+        results = []
+        for candidate in candidates:
+            fn = self._make_field_fn(candidate)
+            result = self._evaluate_grouping(documents, doc_paths, fn, candidate)
+            if result.score > 0:
+                results.append(result)
+
+        # Sort by score (best first)
+        results.sort(key=lambda r: r.score, reverse=True)
+        return results
+
+    def _find_candidate_fields(
+        self,
+        documents: list[dict],
+        max_cardinality: int,
+        min_coverage: float,
+        max_depth: int,
+    ) -> list[str]:
+        """Find fields that could be good splitters."""
+        # One walk per document collects values for every shallow scalar path.
+        # Paths are dropped as soon as they exceed max_cardinality or can no
+        # longer reach min_coverage, so ids and timestamps stop costing work.
+        n_docs = len(documents)
+        path_values: dict[str, set[str]] = defaultdict(set)
+        path_present: Counter[str] = Counter()
+        dropped: set[str] = set()
+
+        for i, doc in enumerate(documents):
+            remaining = n_docs - i - 1
+            for path, value in self.extractor.extract_scalar_leaves(doc, max_depth):
+                if path in dropped:
+                    continue
+
+                present = path_present[path] + 1
+                values = path_values[path]
+                values.add(str(value))
+                if (present + remaining) / n_docs < min_coverage or len(values) > max_cardinality:
+                    dropped.add(path)
+                    del path_present[path]
+                    del path_values[path]
+                    continue
+
+                path_present[path] = present
+
+        # Filter by coverage and cardinality
+        candidates = []
+        for path, present_count in path_present.items():
+            coverage = present_count / n_docs
+            if coverage < min_coverage:
+                continue
+
+            distinct = len(path_values[path])
+            if distinct > max_cardinality:
+                continue
+
+            # Must have at least 2 distinct values to be a splitter
+            if distinct >= 2:
+                candidates.append(path)
+
+        return candidates
+
+    def _make_field_fn(self, field_path: str) -> Callable[[dict], Any]:
+        """Create a grouping function for a field path."""
+        return path_getter(field_path)
+
+    def _make_composite_fn(self, field_paths: list[str]) -> Callable[[dict], Any]:
+        """Create a grouping function for multiple fields."""
+        getters = tuple(path_getter(p) for p in field_paths)
+
+        def fn(doc: dict) -> Any:
+            return tuple(getter(doc) for getter in getters)
+        return fn
+
+    def _score_with_matrix(
+        self,
+        doc_paths: list[frozenset[str]],
+        groups: dict[str, list[int]],
+        representatives: list[int],
+        structure_sims: np.ndarray,
+    ) -> tuple[float, list[float]]:
+        """
+        Within- and between-group similarity from the structure similarity matrix.
+
+        Each group is reduced to a count per distinct structure, so its total
+        within-group similarity is c·S·c minus the self-pairs, halved.
+
+        Returns:
+            Tuple of (pooled within-group mean, between-group similarities).
+        """
+        _, doc_rows = self._get_structures(doc_paths)
+        n_structures = len(structure_sims)
+
+        within_total = 0.0
+        within_pairs = 0
+        diagonal = np.diagonal(structure_sims)
+        for indices in groups.values():
+            k = len(indices)
+            if k >= 2:
+                counts = np.bincount(doc_rows[indices], minlength=n_structures)
+                total = counts @ structure_sims @ counts - counts @ diagonal
+                within_total += total / 2
+                within_pairs += k * (k - 1) // 2
+
+        within_avg = within_total / within_pairs if within_pairs else 1.0
+
+        rows = doc_rows[representatives]
+        between = structure_sims[np.ix_(rows, rows)]
+        between_sims = between[np.triu_indices(len(rows), k=1)].tolist()
+        return within_avg, between_sims
+
+    def _score_with_strategy(
+        self,
+        doc_paths: list[frozenset[str]],
+        groups: dict[str, list[int]],
+        representatives: list[int],
+    ) -> tuple[float, list[float]]:
+        """
+        Within- and between-group similarity computed with the strategy directly.
+
+        Used for collections with too many distinct structures to hold their
+        pairwise similarity matrix.
+
+        Returns:
+            Tuple of (pooled within-group mean, between-group similarities).
+        """
+        # Within-group similarity, pooled over all within-group pairs
+        mean_pairwise = getattr(self.similarity, "mean_pairwise", None)
+        within_total = 0.0
+        within_pairs = 0
+        for indices in groups.values():
+            k = len(indices)
+            if k >= 2:
+                group_paths = [doc_paths[i] for i in indices]
+                if mean_pairwise is not None:
+                    group_mean = mean_pairwise(group_paths)
+                else:
+                    group_mean = mean_pairwise_similarity(self.similarity, group_paths)
+                pairs = k * (k - 1) // 2
+                within_total += group_mean * pairs
+                within_pairs += pairs
+
+        within_avg = within_total / within_pairs if within_pairs else 1.0
+
+        # Between-group similarity, comparing one document from each group
+        between_sims = []
+        if len(representatives) >= 2:
+            matrix_fn = getattr(self.similarity, "bitset_similarity_matrix", None)
+            packed = self._get_doc_bitsets(doc_paths) if matrix_fn else None
+            if packed is not None:
+                # All representative pairs in one batched call
+                index, bits, doc_rows = packed
+                rep_bits = bits[doc_rows[representatives]]
+                matrix = matrix_fn(rep_bits, rep_bits, index)
+                between_sims = matrix[np.triu_indices(len(representatives), k=1)].tolist()
+            else:
+                for idx1, idx2 in combinations(representatives, 2):
+                    between_sims.append(
+                        self.similarity.similarity(doc_paths[idx1], doc_paths[idx2])
+                    )
+
+        return within_avg, between_sims
+
+    def _evaluate_grouping(
+        self,
+        documents: list[dict],
+        doc_paths: list[frozenset[str]],
+        grouping_fn: Callable[[dict], Any],
+        field_name: str,
+    ) -> SplitterResult:
+        """Evaluate a specific grouping as a potential splitter."""
+        # Group documents by the grouping function
+        groups: dict[str, list[int]] = {}
+        present_count = 0
+
+        for i, doc in enumerate(documents):
+            value = grouping_fn(doc)
+            if value is None:
+                continue
+            # Splitter values are nearly always strings already
+            key = value if type(value) is str else str(value)
+            indices = groups.get(key)
+            if indices is None:
+                groups[key] = [i]
+            else:
+                indices.append(i)
+            present_count += 1
+
+        coverage = present_count / len(documents) if documents else 0
+        distinct_values = len(groups)
+        value_counts = {k: len(v) for k, v in groups.items()}
+
+        representatives = [indices[0] for indices in groups.values()]
+        structure_sims = self._get_structure_similarity(doc_paths)
+        if structure_sims is not None:
+            within_avg, between_sims = self._score_with_matrix(
+                doc_paths, groups, representatives, structure_sims
+            )
+        else:
+            within_avg, between_sims = self._score_with_strategy(
+                doc_paths, groups, representatives
+            )
+
+        between_avg = sum(between_sims) / len(between_sims) if between_sims else 0.001
+
+        # Score = within / between (higher = better splitter)
+        score = within_avg / between_avg if between_avg > 0 else within_avg
+
+        return SplitterResult(
+            field=field_name,
+            score=score,
+            distinct_values=distinct_values,
+            coverage=coverage,
+            value_counts=value_counts,
+            within_similarity=within_avg,
+            between_similarity=between_avg,
+        )
+
+    def describe(
+        self,
+        documents: list[dict],
+        splitter: Optional[str] = None,
+        top_n: int = 5,
+    ) -> str:
+        """
+        Generate a human-readable structure summary.
+
+        Args:
+            documents: List of JSON documents.
+            splitter: Specific splitter to use. If None, auto-detects.
+            top_n: Number of top splitters to show.
+
+        Returns:
+            Formatted string describing the structure.
+        """
+        if not documents:
+            return "No documents to analyze."
+
+        doc_paths = self._get_doc_paths(documents)
+        all_paths = set().union(*set(doc_paths))
+
+        lines = [
+            f"Documents analyzed: {len(documents):,}",
+            f"Unique paths: {len(all_paths)}",
+            "",
+        ]
+
+        # Find splitters
+        results = self.find_splitters(documents, precomputed_paths=doc_paths)
+        if results:
+            lines.append("Candidate splitters:")
+            for i, r in enumerate(results[:top_n]):
+                marker = " ← RECOMMENDED" if i == 0 else ""
+                lines.append(
+                    f"  {r.field} ({r.distinct_values} values, "
+                    f"score: {r.score:.2f}){marker}"
+                )
+            lines.append("")
+
+            # Show structure by best splitter
+            best = results[0] if not splitter else next(
+                (r for r in results if r.field == splitter), results[0]
+            )
+            lines.append(f"Structure by {best.field}:")
+
+            grouping_fn = self._make_field_fn(best.field)
+            groups: dict[str, list[frozenset[str]]] = defaultdict(list)
+
+            for doc, paths in zip(documents, doc_paths):
+                value = grouping_fn(doc)
+                if value is not None:
+                    groups[str(value)].append(paths)
+
+            # Union of paths per group, and how many groups contain each path
+            # (identical structures share one frozenset, so union each only once)
+            group_unions = {
+                value: set().union(*set(path_sets)) for value, path_sets in groups.items()
+            }
+            groups_per_path: Counter[str] = Counter()
+            for union in group_unions.values():
+                groups_per_path.update(union)
+
+            for value, path_sets in sorted(groups.items(), key=lambda x: -len(x[1])):
+                # Get paths unique to this group (not in other groups)
+                unique_to_group = {
+                    p for p in group_unions[value] if groups_per_path[p] == 1
+                }
+
+                # Show compact summary
+                sample = sorted(unique_to_group)[:3]
+                sample_str = ", ".join(sample)
+                if len(unique_to_group) > 3:
+                    sample_str += f" (+{len(unique_to_group) - 3} more)"
+
+                lines.append(f'  "{value}" ({len(path_sets)} docs): {sample_str or "(same as others)"}')
+
+        else:
+            lines.append("No candidate splitters found.")
+
+        return "\n".join(lines)
+
+    def get_structure_by_value(
+        self,
+        documents: list[dict],
+        splitter: str,
+    ) -> dict[str, StructureSummary]:
+        """
+        Get detailed structure information grouped by splitter value.
+
+        Args:
+            documents: List of JSON documents.
+            splitter: Field path to use as splitter.
+
+        Returns:
+            Dict mapping splitter values to StructureSummary.
+        """
+        doc_paths = self._get_doc_paths(documents)
+        grouping_fn = self._make_field_fn(splitter)
+
+        groups: dict[str, list[frozenset[str]]] = defaultdict(list)
+        for doc, paths in zip(documents, doc_paths):
+            value = grouping_fn(doc)
+            if value is not None:
+                groups[str(value)].append(paths)
+
+        summaries = {}
+        for value, path_sets in groups.items():
+            distinct = set(path_sets)
+            all_paths = set().union(*distinct)
+            common_paths = set(path_sets[0]).intersection(*distinct)
+
+            summaries[value] = StructureSummary(
+                value=value,
+                count=len(path_sets),
+                unique_paths=all_paths,
+                common_paths=common_paths,
+                sample_paths=sorted(all_paths)[:10],
+            )
+
+        return summaries
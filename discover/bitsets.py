@@ -0,0 +1,131 @@
+"""
+Packed bitset encoding of document path sets.
+
+Interns each distinct path to a bit index and packs path sets into rows of
+uint64 words, so set intersections and unions become word-wise AND/OR and
+their sizes a popcount, computed for many pairs at once with NumPy.
+"""
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+
+from . import _jaccard_kernel
+
+if hasattr(np, "bitwise_count"):
+    def popcount(words: np.ndarray) -> np.ndarray:
+        """Count set bits in each element of a uint64 array."""
+        return np.bitwise_count(words)
+else:  # NumPy < 2.0
+    _BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(words: np.ndarray) -> np.ndarray:
+        """Count set bits in each element of a uint64 array."""
+        counts = _BYTE_POPCOUNT[words.view(np.uint8)]
+        return counts.reshape(*words.shape, 8).sum(axis=-1)
+
+
+# Upper bound on elements in the temporary arrays of pairwise operations
+_BLOCK_ELEMENTS = 1 << 22
+
+
+class PathBitsetIndex:
+    """
+    Maps paths to bit positions and packs path sets into uint64 bitsets.
+
+    Example:
+        >>> index = PathBitsetIndex()
+        >>> bits = index.pack([{"a", "b"}, {"b", "c"}])
+        >>> jaccard_matrix(bits, bits)[0, 1]
+        0.333...
+    """
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.paths: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def intern(self, paths: Iterable[str]) -> list[int]:
+        """Return bit positions for paths, assigning new ones as needed."""
+        ids = self.ids
+        result = []
+        for path in paths:
+            path_id = ids.get(path)
+            if path_id is None:
+                path_id = ids[path] = len(self.paths)
+                self.paths.append(path)
+            result.append(path_id)
+        return result
+
+    @property
+    def words(self) -> int:
+        """Number of uint64 words per packed row."""
+        return max(1, -(-len(self.paths) // 64))
+
+    def pack(self, path_sets: Sequence[Iterable[str]]) -> np.ndarray:
+        """
+        Pack path sets into an (N, words) uint64 array, one row per set.
+
+        All paths are interned before packing, so every row has the same
+        width and rows packed in one call can be compared directly.
+        """
+        row_ids = [self.intern(paths) for paths in path_sets]
+        bits = np.zeros((len(row_ids), self.words), dtype=np.uint64)
+
+        for row, ids in enumerate(row_ids):
+            if ids:
+                ids_arr = np.fromiter(ids, dtype=np.int64, count=len(ids))
+                np.bitwise_or.at(
+                    bits[row],
+                    ids_arr >> 6,
+                    np.left_shift(np.uint64(1), (ids_arr & 63).astype(np.uint64)),
+                )
+
+        return bits
+
+
+def unpack(bits: np.ndarray, n_paths: int) -> np.ndarray:
+    """
+    Expand packed bitsets to an (N, n_paths) boolean indicator matrix.
+
+    Column i is True where the row's set contains the path with bit index i.
+    """
+    as_bytes = bits.astype("<u8", copy=False).view(np.uint8)
+    return np.unpackbits(as_bytes, axis=1, count=n_paths, bitorder="little").astype(bool)
+
+
+def jaccard_matrix(bits_a: np.ndarray, bits_b: np.ndarray) -> np.ndarray:
+    """
+    Jaccard similarity between every row of bits_a and every row of bits_b.
+
+    Uses the compiled kernel in _jaccard_kernel when numba is installed.
+    Otherwise rows of bits_a are processed in blocks so the (rows, M, W)
+    intermediate stays small even for thousands of rows.
+
+    Args:
+        bits_a: (N, W) uint64 bitsets.
+        bits_b: (M, W) uint64 bitsets packed with the same index.
+
+    Returns:
+        (N, M) float64 array; pairs of empty sets have similarity 1.0.
+    """
+    if _jaccard_kernel.HAS_NUMBA:
+        return _jaccard_kernel.jaccard_matrix(bits_a, bits_b)
+
+    sizes_a = popcount(bits_a).sum(axis=1, dtype=np.int64)
+    sizes_b = popcount(bits_b).sum(axis=1, dtype=np.int64)
+
+    intersections = np.empty((len(bits_a), len(bits_b)), dtype=np.int64)
+    block = max(1, _BLOCK_ELEMENTS // max(1, bits_b.size))
+    for start in range(0, len(bits_a), block):
+        chunk = bits_a[start:start + block]
+        intersections[start:start + block] = popcount(
+            chunk[:, None, :] & bits_b[None, :, :]
+        ).sum(axis=2, dtype=np.int64)
+
+    unions = sizes_a[:, None] + sizes_b[None, :] - intersections
+
+    result = np.ones(intersections.shape, dtype=np.float64)
+    np.divide(intersections, unions, out=result, where=unions > 0)
+    return result
@@ -1,109 +1,257 @@
-"""
-Similarity strategies for comparing JSON document structures.
-
-Provides pluggable similarity calculations for the StructureAnalyzer.
-"""
-from abc import ABC, abstractmethod
-from typing import Protocol, runtime_checkable
-
-
-@runtime_checkable
-class SimilarityStrategy(Protocol):
-    """Protocol for similarity calculation strategies."""
-
-    def similarity(self, paths_a: set[str], paths_b: set[str]) -> float:
-        """
-        Calculate similarity between two path sets.
-
-        Args:
-            paths_a: Path set from first document.
-            paths_b: Path set from second document.
-
-        Returns:
-            Similarity score between 0 and 1.
-        """
-        ...
-
-
-class JaccardPathSimilarity:
-    """
-    Jaccard similarity on path sets.
-
-    Jaccard Index = |A ∩ B| / |A ∪ B|
-
-    Range: 0 (completely different) to 1 (identical)
-
-    Example:
-        >>> sim = JaccardPathSimilarity()
-        >>> paths_a = {"header.action", "body.items[].sku"}
-        >>> paths_b = {"header.action", "body.user.name"}
-        >>> sim.similarity(paths_a, paths_b)
-        0.333...  # 1 intersection / 3 union
-    """
-
-    def similarity(self, paths_a: set[str], paths_b: set[str]) -> float:
-        """Calculate Jaccard similarity between two path sets."""
-        if not paths_a and not paths_b:
-            return 1.0  # Both empty = identical
-
-        intersection = len(paths_a & paths_b)
-        union = len(paths_a | paths_b)
-
-        if union == 0:
-            return 1.0
-
-        return intersection / union
-
-
-class WeightedJaccardSimilarity:
-    """
-    Weighted Jaccard similarity with depth decay.
-
-    Deeper paths contribute less to the similarity score.
-    Useful when structural differences near the root matter more.
-
-    Args:
-        depth_decay: Factor to multiply weight by for each level of depth.
-                    0.8 means depth 2 has 0.64 weight, depth 3 has 0.51, etc.
-    """
-
-    def __init__(self, depth_decay: float = 0.8):
-        self.depth_decay = depth_decay
-
-    def _path_weight(self, path: str) -> float:
-        """Calculate weight based on path depth."""
-        depth = path.count(".") + path.count("[]")
-        return self.depth_decay ** depth
-
-    def similarity(self, paths_a: set[str], paths_b: set[str]) -> float:
-        """Calculate weighted Jaccard similarity."""
-        if not paths_a and not paths_b:
-            return 1.0
-
-        all_paths = paths_a | paths_b
-        if not all_paths:
-            return 1.0
-
-        intersection_weight = sum(
-            self._path_weight(p) for p in paths_a & paths_b
-        )
-        union_weight = sum(
-            self._path_weight(p) for p in all_paths
-        )
-
-        if union_weight == 0:
-            return 1.0
-
-        return intersection_weight / union_weight
-
-
-class ExactMatchSimilarity:
-    """
-    Binary similarity - 1 if path sets are identical, 0 otherwise.
-
-    Useful for strict structural matching.
-    """
-
-    def similarity(self, paths_a: set[str], paths_b: set[str]) -> float:
-        """Return 1.0 if identical, 0.0 otherwise."""
-        return 1.0 if paths_a == paths_b else 0.0
+"""
+Similarity strategies for comparing JSON document structures.
+
+Provides pluggable similarity calculations for the StructureAnalyzer.
+"""
+import random
+from collections import Counter
+from itertools import combinations
+from typing import Protocol, Sequence, runtime_checkable
+
+import numpy as np
+
+from .bitsets import PathBitsetIndex, jaccard_matrix, unpack
+
+# Above this many distinct structures in a group, mean_pairwise_similarity
+# estimates the mean from a fixed sample of document pairs.
+MAX_EXACT_STRUCTURES = 64
+SAMPLE_PAIRS = 200
+
+
+@runtime_checkable
+class SimilarityStrategy(Protocol):
+    """Protocol for similarity calculation strategies."""
+
+    def similarity(self, paths_a: set[str], paths_b: set[str]) -> float:
+        """
+        Calculate similarity between two path sets.
+
+        Args:
+            paths_a: Path set from first document.
+            paths_b: Path set from second document.
+
+        Returns:
+            Similarity score between 0 and 1.
+        """
+        ...
+
+
+def mean_pairwise_similarity(
+    strategy: SimilarityStrategy,
+    path_sets: Sequence[frozenset[str]],
+) -> float:
+    """
+    Mean similarity over all pairs of path sets, for any strategy.
+
+    Identical structures are collapsed first, so a group of k documents with
+    u distinct structures costs O(u²) similarity calls instead of O(k²).
+    Groups with more than MAX_EXACT_STRUCTURES distinct structures are
+    estimated from SAMPLE_PAIRS document pairs drawn with a fixed seed.
+
+    Strategies may provide their own ``mean_pairwise(path_sets)`` method;
+    StructureAnalyzer prefers it over this function when present. Likewise,
+    a ``bitset_similarity_matrix(bits_a, bits_b, index)`` method is used to
+    compare many path sets at once when they are packed as bitsets (see
+    discover.bitsets).
+
+    Args:
+        strategy: Similarity strategy used for each pair.
+        path_sets: Path sets of the documents in one group.
+
+    Returns:
+        Mean pairwise similarity, or 1.0 when there are fewer than two sets.
+    """
+    k = len(path_sets)
+    if k < 2:
+        return 1.0
+
+    structures = Counter(path_sets)
+    if len(structures) > MAX_EXACT_STRUCTURES:
+        rng = random.Random(0)
+        total = 0.0
+        for _ in range(SAMPLE_PAIRS):
+            i, j = rng.sample(range(k), 2)
+            total += strategy.similarity(path_sets[i], path_sets[j])
+        return total / SAMPLE_PAIRS
+
+    total = 0.0
+    for paths, n in structures.items():
+        if n >= 2:
+            total += strategy.similarity(paths, paths) * n * (n - 1) / 2
+    for (paths_a, n_a), (paths_b, n_b) in combinations(structures.items(), 2):
+        total += strategy.similarity(paths_a, paths_b) * n_a * n_b
+
+    return total / (k * (k - 1) / 2)
+
+
+class JaccardPathSimilarity:
+    """
+    Jaccard similarity on path sets.
+
+    Jaccard Index = |A ∩ B| / |A ∪ B|
+
+    Range: 0 (completely different) to 1 (identical)
+
+    Example:
+        >>> sim = JaccardPathSimilarity()
+        >>> paths_a = {"header.action", "body.items[].sku"}
+        >>> paths_b = {"header.action", "body.user.name"}
+        >>> sim.similarity(paths_a, paths_b)
+        0.333...  # 1 intersection / 3 union
+    """
+
+    def similarity(self, paths_a: set[str], paths_b: set[str]) -> float:
+        """Calculate Jaccard similarity between two path sets."""
+        if not paths_a and not paths_b:
+            return 1.0  # Both empty = identical
+
+        intersection = len(paths_a & paths_b)
+        # Union size follows from the intersection; no need to build the union
+        union = len(paths_a) + len(paths_b) - intersection
+
+        if union == 0:
+            return 1.0
+
+        return intersection / union
+
+    def bitset_similarity_matrix(
+        self, bits_a: np.ndarray, bits_b: np.ndarray, index: PathBitsetIndex
+    ) -> np.ndarray:
+        """Jaccard similarity between every pair of rows of two bitset arrays."""
+        return jaccard_matrix(bits_a, bits_b)
+
+    def mean_pairwise(self, path_sets: Sequence[frozenset[str]]) -> float:
+        """
+        Estimate mean pairwise Jaccard from per-path document counts.
+
+        If path p appears in c_p of the k sets, it is in the intersection of
+        c_p(c_p-1)/2 pairs and in the union of c_p(2k-c_p-1)/2 pairs. The
+        ratio of those totals is exact when all pairs have the same union
+        size and a close estimate otherwise, in one pass over the paths.
+        """
+        k = len(path_sets)
+        if k < 2:
+            return 1.0
+
+        counts: Counter[str] = Counter()
+        for paths in path_sets:
+            counts.update(paths)
+
+        intersections = 0
+        unions = 0
+        for c in counts.values():
+            intersections += c * (c - 1)
+            unions += c * (2 * k - c - 1)
+
+        if unions == 0:
+            return 1.0  # Every set empty = identical
+
+        return intersections / unions
+
+
+class WeightedJaccardSimilarity:
+    """
+    Weighted Jaccard similarity with depth decay.
+
+    Deeper paths contribute less to the similarity score.
+    Useful when structural differences near the root matter more.
+
+    Args:
+        depth_decay: Factor to multiply weight by for each level of depth.
+                    0.8 means depth 2 has 0.64 weight, depth 3 has 0.51, etc.
+    """
+
+    def __init__(self, depth_decay: float = 0.8):
+        self.depth_decay = depth_decay
+
+    @property
+    def depth_decay(self) -> float:
+        return self._depth_decay
+
+    @depth_decay.setter
+    def depth_decay(self, value: float) -> None:
+        self._depth_decay = value
+        # Path -> weight; the same paths recur across every pairwise call
+        self._weights: dict[str, float] = {}
+
+    def _path_weight(self, path: str) -> float:
+        """Calculate weight based on path depth."""
+        weight = self._weights.get(path)
+        if weight is None:
+            depth = path.count(".") + path.count("[]")
+            weight = self._weights[path] = self.depth_decay ** depth
+        return weight
+
+    def similarity(self, paths_a: set[str], paths_b: set[str]) -> float:
+        """Calculate weighted Jaccard similarity."""
+        if not paths_a and not paths_b:
+            return 1.0
+
+        weights = self._weights
+        weight = self._path_weight
+        intersection_weight = sum(
+            weights[p] if p in weights else weight(p) for p in paths_a & paths_b
+        )
+        # Weighted union = w(A) + w(B) - w(A ∩ B), without building A ∪ B
+        union_weight = (
+            sum(weights[p] if p in weights else weight(p) for p in paths_a)
+            + sum(weights[p] if p in weights else weight(p) for p in paths_b)
+            - intersection_weight
+        )
+
+        if union_weight <= 0:
+            return 1.0
+
+        return min(1.0, intersection_weight / union_weight)
+
+    def bitset_similarity_matrix(
+        self, bits_a: np.ndarray, bits_b: np.ndarray, index: PathBitsetIndex
+    ) -> np.ndarray:
+        """
+        Weighted Jaccard between every pair of rows of two bitset arrays.
+
+        Intersection weights for all pairs come from one matrix product of
+        the weighted path indicators; union weights follow as
+        weight(A) + weight(B) - weight(A & B).
+        """
+        weights = np.array([self._path_weight(p) for p in index.paths], dtype=np.float64)
+        indicators_a = unpack(bits_a, len(index)).astype(np.float64)
+        indicators_b = unpack(bits_b, len(index)).astype(np.float64)
+
+        intersections = (indicators_a * weights) @ indicators_b.T
+        unions = (indicators_a @ weights)[:, None] + (indicators_b @ weights)[None, :] - intersections
+
+        result = np.ones(intersections.shape, dtype=np.float64)
+        np.divide(intersections, unions, out=result, where=unions > 0)
+        return result
+
+
+class ExactMatchSimilarity:
+    """
+    Binary similarity - 1 if path sets are identical, 0 otherwise.
+
+    Useful for strict structural matching.
+    """
+
+    def similarity(self, paths_a: set[str], paths_b: set[str]) -> float:
+        """Return 1.0 if identical, 0.0 otherwise."""
+        if paths_a is paths_b:
+            return 1.0
+        if len(paths_a) != len(paths_b):
+            return 0.0
+        # frozensets cache their hash, so unequal hashes rule out a match
+        # without touching the elements
+        if (
+            isinstance(paths_a, frozenset)
+            and isinstance(paths_b, frozenset)
+            and hash(paths_a) != hash(paths_b)
+        ):
+            return 0.0
+        return 1.0 if paths_a == paths_b else 0.0
+
+    def bitset_similarity_matrix(
+        self, bits_a: np.ndarray, bits_b: np.ndarray, index: PathBitsetIndex
+    ) -> np.ndarray:
+        """1.0 where a row of bits_a equals a row of bits_b, 0.0 elsewhere."""
+        # Two sets are equal exactly when their Jaccard similarity is 1
+        return (jaccard_matrix(bits_a, bits_b) == 1.0).astype(np.float64)
@@ -1,348 +1,603 @@
-"""Tests for the discover module - structure analysis and splitter discovery."""
-import pytest
-
-from common.paths import PathExtractor, extract_paths
-from discover import (
-    StructureAnalyzer,
-    SplitterResult,
-    JaccardPathSimilarity,
-    WeightedJaccardSimilarity,
-    ExactMatchSimilarity,
-)
-
-
-class TestPathExtractor:
-    """Tests for path extraction from JSON documents."""
-
-    @pytest.fixture
-    def extractor(self):
-        return PathExtractor()
-
-    def test_simple_object(self, extractor):
-        doc = {"name": "test", "value": 42}
-        paths = extractor.extract(doc)
-        assert paths == {"name", "value"}
-
-    def test_nested_object(self, extractor):
-        doc = {"header": {"action": "test", "id": "123"}}
-        paths = extractor.extract(doc)
-        assert paths == {"header.action", "header.id"}
-
-    def test_deep_nesting(self, extractor):
-        doc = {"a": {"b": {"c": {"d": "value"}}}}
-        paths = extractor.extract(doc)
-        assert paths == {"a.b.c.d"}
-
-    def test_array_of_primitives(self, extractor):
-        doc = {"tags": ["a", "b", "c"]}
-        paths = extractor.extract(doc)
-        assert paths == {"tags[]"}
-
-    def test_array_of_objects(self, extractor):
-        doc = {"items": [{"sku": "A", "price": 10}, {"sku": "B", "price": 20}]}
-        paths = extractor.extract(doc)
-        assert paths == {"items[].sku", "items[].price"}
-
-    def test_nested_arrays(self, extractor):
-        doc = {
-            "orders": [
-                {"id": "1", "items": [{"sku": "A"}, {"sku": "B"}]},
-                {"id": "2", "items": [{"sku": "C"}]}
-            ]
-        }
-        paths = extractor.extract(doc)
-        assert paths == {"orders[].id", "orders[].items[].sku"}
-
-    def test_mixed_structure(self, extractor):
-        doc = {
-            "header": {"action": "OrderCreated"},
-            "body": {
-                "customer": {"name": "Alice"},
-                "items": [{"sku": "A", "qty": 1}]
-            }
-        }
-        paths = extractor.extract(doc)
-        expected = {
-            "header.action",
-            "body.customer.name",
-            "body.items[].sku",
-            "body.items[].qty"
-        }
-        assert paths == expected
-
-    def test_empty_array(self, extractor):
-        doc = {"items": []}
-        paths = extractor.extract(doc)
-        assert paths == {"items[]"}
-
-    def test_empty_object(self, extractor):
-        doc = {"data": {}}
-        paths = extractor.extract(doc)
-        assert paths == set()
-
-    def test_convenience_function(self):
-        doc = {"a": {"b": "value"}}
-        paths = extract_paths(doc)
-        assert paths == {"a.b"}
-
-    def test_get_value_at_path(self, extractor):
-        doc = {"header": {"action": "test"}, "body": {"value": 42}}
-        assert extractor.get_value_at_path(doc, "header.action") == "test"
-        assert extractor.get_value_at_path(doc, "body.value") == 42
-        assert extractor.get_value_at_path(doc, "missing") is None
-        assert extractor.get_value_at_path(doc, "header.missing") is None
-
-
-class TestJaccardSimilarity:
-    """Tests for Jaccard similarity calculation."""
-
-    @pytest.fixture
-    def sim(self):
-        return JaccardPathSimilarity()
-
-    def test_identical_sets(self, sim):
-        paths = {"a", "b", "c"}
-        assert sim.similarity(paths, paths) == 1.0
-
-    def test_completely_different(self, sim):
-        paths_a = {"a", "b"}
-        paths_b = {"c", "d"}
-        assert sim.similarity(paths_a, paths_b) == 0.0
-
-    def test_partial_overlap(self, sim):
-        paths_a = {"a", "b", "c"}
-        paths_b = {"b", "c", "d"}
-        # Intersection: {b, c} = 2
-        # Union: {a, b, c, d} = 4
-        # Jaccard = 2/4 = 0.5
-        assert sim.similarity(paths_a, paths_b) == 0.5
-
-    def test_subset(self, sim):
-        paths_a = {"a", "b"}
-        paths_b = {"a", "b", "c", "d"}
-        # Intersection: {a, b} = 2
-        # Union: {a, b, c, d} = 4
-        # Jaccard = 2/4 = 0.5
-        assert sim.similarity(paths_a, paths_b) == 0.5
-
-    def test_empty_sets(self, sim):
-        assert sim.similarity(set(), set()) == 1.0
-
-    def test_one_empty(self, sim):
-        assert sim.similarity({"a"}, set()) == 0.0
-
-
-class TestWeightedJaccardSimilarity:
-    """Tests for weighted Jaccard similarity."""
-
-    def test_deeper_paths_matter_less(self):
-        sim = WeightedJaccardSimilarity(depth_decay=0.5)
-
-        # Shallow difference
-        paths_a = {"a", "b"}
-        paths_b = {"a", "c"}
-
-        # Deep difference
-        paths_c = {"a", "x.y.z"}
-        paths_d = {"a", "x.y.w"}
-
-        shallow_sim = sim.similarity(paths_a, paths_b)
-        deep_sim = sim.similarity(paths_c, paths_d)
-
-        # Deep differences should result in higher similarity
-        # because the differing paths have lower weight
-        assert deep_sim > shallow_sim
-
-
-class TestExactMatchSimilarity:
-    """Tests for exact match similarity."""
-
-    @pytest.fixture
-    def sim(self):
-        return ExactMatchSimilarity()
-
-    def test_identical(self, sim):
-        paths = {"a", "b", "c"}
-        assert sim.similarity(paths, paths) == 1.0
-
-    def test_different(self, sim):
-        paths_a = {"a", "b"}
-        paths_b = {"a", "b", "c"}
-        assert sim.similarity(paths_a, paths_b) == 0.0
-
-
-class TestStructureAnalyzer:
-    """Tests for the main StructureAnalyzer."""
-
-    @pytest.fixture
-    def analyzer(self):
-        return StructureAnalyzer()
-
-    @pytest.fixture
-    def sample_documents(self):
-        """Documents with clear structural differences based on header.action."""
-        return [
-            # OrderCreated documents - have items array
-            {"header": {"action": "OrderCreated"}, "body": {"items": [{"sku": "A"}]}},
-            {"header": {"action": "OrderCreated"}, "body": {"items": [{"sku": "B"}]}},
-            {"header": {"action": "OrderCreated"}, "body": {"items": [{"sku": "C"}]}},
-            # UserCreated documents - have user object
-            {"header": {"action": "UserCreated"}, "body": {"user": {"name": "Alice"}}},
-            {"header": {"action": "UserCreated"}, "body": {"user": {"name": "Bob"}}},
-            # EventLogged documents - have event object
-            {"header": {"action": "EventLogged"}, "body": {"event": {"type": "click"}}},
-            {"header": {"action": "EventLogged"}, "body": {"event": {"type": "view"}}},
-        ]
-
-    def test_find_splitters_auto_detect(self, analyzer, sample_documents):
-        """Auto-detect should find header.action as best splitter."""
-        results = analyzer.find_splitters(sample_documents)
-
-        assert len(results) > 0
-        best = results[0]
-        assert best.field == "header.action"
-        assert best.distinct_values == 3
-        assert best.score > 1.0  # Good splitters have score > 1
-
-    def test_find_splitters_explicit_field(self, analyzer, sample_documents):
-        """Explicit field evaluation should work."""
-        results = analyzer.find_splitters(
-            sample_documents,
-            grouping_field="header.action"
-        )
-
-        assert len(results) == 1
-        assert results[0].field == "header.action"
-
-    def test_find_splitters_custom_function(self, analyzer, sample_documents):
-        """Custom grouping function should work."""
-        results = analyzer.find_splitters(
-            sample_documents,
-            grouping_fn=lambda d: d.get("header", {}).get("action")
-        )
-
-        assert len(results) == 1
-        assert results[0].field == "custom"
-        assert results[0].distinct_values == 3
-
-    def test_splitter_result_contents(self, analyzer, sample_documents):
-        """SplitterResult should contain expected data."""
-        results = analyzer.find_splitters(sample_documents)
-        best = results[0]
-
-        assert isinstance(best.score, float)
-        assert best.coverage == 1.0  # All docs have header.action
-        assert best.value_counts == {
-            "OrderCreated": 3,
-            "UserCreated": 2,
-            "EventLogged": 2
-        }
-
-    def test_describe_output(self, analyzer, sample_documents):
-        """describe() should return formatted string."""
-        output = analyzer.describe(sample_documents)
-
-        assert "Documents analyzed: 7" in output
-        assert "header.action" in output
-        assert "RECOMMENDED" in output
-
-    def test_empty_documents(self, analyzer):
-        """Should handle empty document list."""
-        results = analyzer.find_splitters([])
-        assert results == []
-
-        output = analyzer.describe([])
-        assert "No documents" in output
-
-    def test_uniform_structure(self, analyzer):
-        """Documents with identical structure - no good splitter."""
-        docs = [
-            {"type": "A", "value": 1},
-            {"type": "B", "value": 2},
-            {"type": "C", "value": 3},
-        ]
-        results = analyzer.find_splitters(docs)
-
-        # May find type as candidate, but score should be ~1 (no differentiation)
-        if results:
-            # Score near 1 means within-group ≈ between-group similarity
-            assert results[0].score < 2.0
-
-    def test_get_structure_by_value(self, analyzer, sample_documents):
-        """get_structure_by_value should return detailed summaries."""
-        summaries = analyzer.get_structure_by_value(
-            sample_documents,
-            splitter="header.action"
-        )
-
-        assert "OrderCreated" in summaries
-        assert "UserCreated" in summaries
-
-        order_summary = summaries["OrderCreated"]
-        assert order_summary.count == 3
-        assert "body.items[].sku" in order_summary.unique_paths
-
-        user_summary = summaries["UserCreated"]
-        assert user_summary.count == 2
-        assert "body.user.name" in user_summary.unique_paths
-
-
-class TestSplitterDetectionAccuracy:
-    """Tests to verify splitter detection works on realistic data."""
-
-    @pytest.fixture
-    def analyzer(self):
-        return StructureAnalyzer()
-
-    def test_ocpp_like_messages(self, analyzer):
-        """Test with OCPP-like charge point messages."""
-        docs = [
-            # MeterValues - have meterValue array
-            {
-                "header": {"action": "MeterValues"},
-                "body": {"meterValue": [{"timestamp": "2024-01-01", "sampledValue": [{"value": "100"}]}]}
-            },
-            {
-                "header": {"action": "MeterValues"},
-                "body": {"meterValue": [{"timestamp": "2024-01-02", "sampledValue": [{"value": "200"}]}]}
-            },
-            # StatusNotification - have status/errorCode
-            {
-                "header": {"action": "StatusNotification"},
-                "body": {"status": "Available", "errorCode": "NoError"}
-            },
-            {
-                "header": {"action": "StatusNotification"},
-                "body": {"status": "Charging", "errorCode": "NoError"}
-            },
-            # Heartbeat - minimal body
-            {
-                "header": {"action": "Heartbeat"},
-                "body": {}
-            },
-            {
-                "header": {"action": "Heartbeat"},
-                "body": {}
-            },
-        ]
-
-        results = analyzer.find_splitters(docs)
-
-        assert len(results) > 0
-        assert results[0].field == "header.action"
-        assert results[0].score > 1.5  # Should clearly differentiate
-
-    def test_high_cardinality_excluded(self, analyzer):
-        """Fields with too many distinct values should be excluded."""
-        docs = [
-            {"id": f"unique-{i}", "type": "A" if i < 5 else "B", "value": i}
-            for i in range(10)
-        ]
-
-        results = analyzer.find_splitters(docs, max_cardinality=5)
-
-        # 'id' has 10 distinct values, should be excluded
-        # 'type' has 2 values, should be included
-        field_names = [r.field for r in results]
-        assert "id" not in field_names
-        assert "type" in field_names
+"""Tests for the discover module - structure analysis and splitter discovery."""
+from itertools import combinations
+
+import pytest
+
+from common.paths import PathExtractor, extract_paths, path_getter
+from discover import _jaccard_kernel
+from discover.bitsets import PathBitsetIndex, jaccard_matrix, popcount, unpack
+from discover import (
+    StructureAnalyzer,
+    SplitterResult,
+    JaccardPathSimilarity,
+    WeightedJaccardSimilarity,
+    ExactMatchSimilarity,
+    mean_pairwise_similarity,
+    sample_documents,
+)
+
+
+class TestPathExtractor:
+    """Tests for path extraction from JSON documents."""
+
+    @pytest.fixture
+    def extractor(self):
+        return PathExtractor()
+
+    def test_simple_object(self, extractor):
+        doc = {"name": "test", "value": 42}
+        paths = extractor.extract(doc)
+        assert paths == {"name", "value"}
+
+    def test_nested_object(self, extractor):
+        doc = {"header": {"action": "test", "id": "123"}}
+        paths = extractor.extract(doc)
+        assert paths == {"header.action", "header.id"}
+
+    def test_deep_nesting(self, extractor):
+        doc = {"a": {"b": {"c": {"d": "value"}}}}
+        paths = extractor.extract(doc)
+        assert paths == {"a.b.c.d"}
+
+    def test_array_of_primitives(self, extractor):
+        doc = {"tags": ["a", "b", "c"]}
+        paths = extractor.extract(doc)
+        assert paths == {"tags[]"}
+
+    def test_array_of_objects(self, extractor):
+        doc = {"items": [{"sku": "A", "price": 10}, {"sku": "B", "price": 20}]}
+        paths = extractor.extract(doc)
+        assert paths == {"items[].sku", "items[].price"}
+
+    def test_nested_arrays(self, extractor):
+        doc = {
+            "orders": [
+                {"id": "1", "items": [{"sku": "A"}, {"sku": "B"}]},
+                {"id": "2", "items": [{"sku": "C"}]}
+            ]
+        }
+        paths = extractor.extract(doc)
+        assert paths == {"orders[].id", "orders[].items[].sku"}
+
+    def test_mixed_structure(self, extractor):
+        doc = {
+            "header": {"action": "OrderCreated"},
+            "body": {
+                "customer": {"name": "Alice"},
+                "items": [{"sku": "A", "qty": 1}]
+            }
+        }
+        paths = extractor.extract(doc)
+        expected = {
+            "header.action",
+            "body.customer.name",
+            "body.items[].sku",
+            "body.items[].qty"
+        }
+        assert paths == expected
+
+    def test_empty_array(self, extractor):
+        doc = {"items": []}
+        paths = extractor.extract(doc)
+        assert paths == {"items[]"}
+
+    def test_empty_object(self, extractor):
+        doc = {"data": {}}
+        paths = extractor.extract(doc)
+        assert paths == set()
+
+    def test_mixed_array(self, extractor):
+        doc = {"items": [{"sku": "A"}, "loose", ["x"]]}
+        paths = extractor.extract(doc)
+        assert paths == {"items[]", "items[].sku", "items[][]"}
+
+    def test_array_indices(self):
+        extractor = PathExtractor(include_array_indices=True)
+        doc = {"items": [{"sku": "A"}, {"sku": "B"}]}
+        paths = extractor.extract(doc)
+        assert paths == {"items[0].sku", "items[1].sku"}
+
+    def test_nesting_beyond_recursion_limit(self, extractor):
+        doc = current = {}
+        for _ in range(5000):
+            current["n"] = {}
+            current = current["n"]
+        current["leaf"] = 1
+        paths = extractor.extract(doc)
+        assert len(paths) == 1
+
+    def test_extract_scalar_leaves(self, extractor):
+        doc = {
+            "header": {"action": "test", "meta": {"deep": 1}},
+            "items": [{"sku": "A"}],
+            "missing": None,
+        }
+        leaves = dict(extractor.extract_scalar_leaves(doc, max_depth=2))
+        assert leaves == {"header.action": "test"}
+        assert dict(extractor.extract_scalar_leaves(doc))["header.meta.deep"] == 1
+
+    def test_convenience_function(self):
+        doc = {"a": {"b": "value"}}
+        paths = extract_paths(doc)
+        assert paths == {"a.b"}
+
+    def test_get_value_at_path(self, extractor):
+        doc = {"header": {"action": "test"}, "body": {"value": 42}}
+        assert extractor.get_value_at_path(doc, "header.action") == "test"
+        assert extractor.get_value_at_path(doc, "body.value") == 42
+        assert extractor.get_value_at_path(doc, "missing") is None
+        assert extractor.get_value_at_path(doc, "header.missing") is None
+
+    def test_path_getter_matches_get_value_at_path(self, extractor):
+        doc = {"header": {"action": "test"}, "items": [{"sku": "A"}], "flat": 1}
+        for path in ("header.action", "flat", "missing", "header.action.x", "items[].sku"):
+            assert path_getter(path)(doc) == extractor.get_value_at_path(doc, path)
+        assert path_getter("flat")(["not", "a", "dict"]) is None
+
+
+class TestJaccardSimilarity:
+    """Tests for Jaccard similarity calculation."""
+
+    @pytest.fixture
+    def sim(self):
+        return JaccardPathSimilarity()
+
+    def test_identical_sets(self, sim):
+        paths = {"a", "b", "c"}
+        assert sim.similarity(paths, paths) == 1.0
+
+    def test_completely_different(self, sim):
+        paths_a = {"a", "b"}
+        paths_b = {"c", "d"}
+        assert sim.similarity(paths_a, paths_b) == 0.0
+
+    def test_partial_overlap(self, sim):
+        paths_a = {"a", "b", "c"}
+        paths_b = {"b", "c", "d"}
+        # Intersection: {b, c} = 2
+        # Union: {a, b, c, d} = 4
+        # Jaccard = 2/4 = 0.5
+        assert sim.similarity(paths_a, paths_b) == 0.5
+
+    def test_subset(self, sim):
+        paths_a = {"a", "b"}
+        paths_b = {"a", "b", "c", "d"}
+        # Intersection: {a, b} = 2
+        # Union: {a, b, c, d} = 4
+        # Jaccard = 2/4 = 0.5
+        assert sim.similarity(paths_a, paths_b) == 0.5
+
+    def test_empty_sets(self, sim):
+        assert sim.similarity(set(), set()) == 1.0
+
+    def test_one_empty(self, sim):
+        assert sim.similarity({"a"}, set()) == 0.0
+
+    def test_bitset_similarity_matrix(self, sim):
+        index = PathBitsetIndex()
+        sets = [{"a", "b", "c"}, {"b", "c", "d"}, set()]
+        bits = index.pack(sets)
+        matrix = sim.bitset_similarity_matrix(bits, bits, index)
+
+        for i, a in enumerate(sets):
+            for j, b in enumerate(sets):
+                assert matrix[i, j] == sim.similarity(a, b)
+
+    def test_mean_pairwise_equal_unions(self, sim):
+        # Every pair has union size 3, so the closed form is exact
+        sets = [frozenset("ab"), frozenset("bc"), frozenset("ac")]
+        brute = sum(sim.similarity(a, b) for a, b in combinations(sets, 2)) / 3
+        assert sim.mean_pairwise(sets) == pytest.approx(brute)
+
+    def test_mean_pairwise_identical(self, sim):
+        sets = [frozenset("ab")] * 4
+        assert sim.mean_pairwise(sets) == 1.0
+        assert sim.mean_pairwise([frozenset(), frozenset()]) == 1.0
+
+
+class TestMeanPairwiseSimilarity:
+    """Tests for the strategy-agnostic mean pairwise similarity."""
+
+    def test_matches_brute_force(self):
+        sim = WeightedJaccardSimilarity()
+        sets = [frozenset(s) for s in ("ab", "ab", "abc", "c", "ab", "bcd")]
+        pairs = list(combinations(sets, 2))
+        brute = sum(sim.similarity(a, b) for a, b in pairs) / len(pairs)
+        assert mean_pairwise_similarity(sim, sets) == pytest.approx(brute)
+
+    def test_single_set(self):
+        assert mean_pairwise_similarity(ExactMatchSimilarity(), [frozenset("a")]) == 1.0
+
+    def test_many_structures_sampled(self):
+        sets = [frozenset({f"p{i}"}) for i in range(100)]
+        assert mean_pairwise_similarity(ExactMatchSimilarity(), sets) == 0.0
+
+
+class TestPathBitsetIndex:
+    """Tests for packed path bitsets."""
+
+    def test_pack_across_word_boundary(self):
+        index = PathBitsetIndex()
+        wide = {f"p{i}" for i in range(130)}
+        bits = index.pack([wide, {"p0", "p129"}])
+
+        assert bits.shape == (2, 3)
+        assert popcount(bits).sum(axis=1).tolist() == [130, 2]
+        indicators = unpack(bits, len(index))
+        assert indicators.shape == (2, 130)
+        assert {index.paths[i] for i in indicators[1].nonzero()[0]} == {"p0", "p129"}
+
+    def test_jaccard_matrix_matches_sets(self):
+        sim = JaccardPathSimilarity()
+        sets = [{f"p{i}" for i in range(0, 100, k)} for k in (1, 2, 3, 7)]
+        index = PathBitsetIndex()
+        bits = index.pack(sets)
+        matrix = jaccard_matrix(bits, bits)
+
+        for i, a in enumerate(sets):
+            for j, b in enumerate(sets):
+                assert matrix[i, j] == pytest.approx(sim.similarity(a, b))
+
+    @pytest.mark.skipif(not _jaccard_kernel.HAS_NUMBA, reason="numba not installed")
+    def test_numba_kernel_matches_numpy(self, monkeypatch):
+        index = PathBitsetIndex()
+        sets = [{f"p{i}" for i in range(0, 150, k)} for k in (1, 2, 3, 7)] + [set()] * 2
+        bits = index.pack(sets)
+
+        compiled = jaccard_matrix(bits, bits), jaccard_matrix(bits[:2], bits)
+        monkeypatch.setattr(_jaccard_kernel, "HAS_NUMBA", False)
+        expected = jaccard_matrix(bits, bits), jaccard_matrix(bits[:2], bits)
+
+        for result, reference in zip(compiled, expected):
+            assert result == pytest.approx(reference)
+
+
+class TestWeightedJaccardSimilarity:
+    """Tests for weighted Jaccard similarity."""
+
+    def test_deeper_paths_matter_less(self):
+        sim = WeightedJaccardSimilarity(depth_decay=0.5)
+
+        # Shallow difference
+        paths_a = {"a", "b"}
+        paths_b = {"a", "c"}
+
+        # Deep difference
+        paths_c = {"a", "x.y.z"}
+        paths_d = {"a", "x.y.w"}
+
+        shallow_sim = sim.similarity(paths_a, paths_b)
+        deep_sim = sim.similarity(paths_c, paths_d)
+
+        # Deep differences should result in higher similarity
+        # because the differing paths have lower weight
+        assert deep_sim > shallow_sim
+
+    def test_bitset_similarity_matrix(self):
+        sim = WeightedJaccardSimilarity(depth_decay=0.5)
+        sets = [{"a", "x.y.z"}, {"a", "x.y.w"}, {"b", "items[].sku"}, set()]
+        index = PathBitsetIndex()
+        bits = index.pack(sets)
+        matrix = sim.bitset_similarity_matrix(bits, bits, index)
+
+        for i, a in enumerate(sets):
+            for j, b in enumerate(sets):
+                assert matrix[i, j] == pytest.approx(sim.similarity(a, b))
+
+    def test_changing_decay_resets_weights(self):
+        sim = WeightedJaccardSimilarity(depth_decay=0.5)
+        paths_a = {"a", "x.y"}
+        paths_b = {"a"}
+        assert sim.similarity(paths_a, paths_b) == pytest.approx(1 / 1.5)
+
+        sim.depth_decay = 1.0
+        assert sim.similarity(paths_a, paths_b) == pytest.approx(0.5)
+
+
+class TestExactMatchSimilarity:
+    """Tests for exact match similarity."""
+
+    @pytest.fixture
+    def sim(self):
+        return ExactMatchSimilarity()
+
+    def test_identical(self, sim):
+        paths = {"a", "b", "c"}
+        assert sim.similarity(paths, paths) == 1.0
+
+    def test_different(self, sim):
+        paths_a = {"a", "b"}
+        paths_b = {"a", "b", "c"}
+        assert sim.similarity(paths_a, paths_b) == 0.0
+
+    def test_frozensets(self, sim):
+        assert sim.similarity(frozenset("ab"), frozenset("ba")) == 1.0
+        assert sim.similarity(frozenset("ab"), frozenset("ac")) == 0.0
+        assert sim.similarity(frozenset("ab"), {"a", "b"}) == 1.0
+
+
+class TestStructureAnalyzer:
+    """Tests for the main StructureAnalyzer."""
+
+    @pytest.fixture
+    def analyzer(self):
+        return StructureAnalyzer()
+
+    @pytest.fixture
+    def sample_documents(self):
+        """Documents with clear structural differences based on header.action."""
+        return [
+            # OrderCreated documents - have items array
+            {"header": {"action": "OrderCreated"}, "body": {"items": [{"sku": "A"}]}},
+            {"header": {"action": "OrderCreated"}, "body": {"items": [{"sku": "B"}]}},
+            {"header": {"action": "OrderCreated"}, "body": {"items": [{"sku": "C"}]}},
+            # UserCreated documents - have user object
+            {"header": {"action": "UserCreated"}, "body": {"user": {"name": "Alice"}}},
+            {"header": {"action": "UserCreated"}, "body": {"user": {"name": "Bob"}}},
+            # EventLogged documents - have event object
+            {"header": {"action": "EventLogged"}, "body": {"event": {"type": "click"}}},
+            {"header": {"action": "EventLogged"}, "body": {"event": {"type": "view"}}},
+        ]
+
+    def test_find_splitters_auto_detect(self, analyzer, sample_documents):
+        """Auto-detect should find header.action as best splitter."""
+        results = analyzer.find_splitters(sample_documents)
+
+        assert len(results) > 0
+        best = results[0]
+        assert best.field == "header.action"
+        assert best.distinct_values == 3
+        assert best.score > 1.0  # Good splitters have score > 1
+
+    def test_find_splitters_explicit_field(self, analyzer, sample_documents):
+        """Explicit field evaluation should work."""
+        results = analyzer.find_splitters(
+            sample_documents,
+            grouping_field="header.action"
+        )
+
+        assert len(results) == 1
+        assert results[0].field == "header.action"
+
+    def test_find_splitters_custom_function(self, analyzer, sample_documents):
+        """Custom grouping function should work."""
+        results = analyzer.find_splitters(
+            sample_documents,
+            grouping_fn=lambda d: d.get("header", {}).get("action")
+        )
+
+        assert len(results) == 1
+        assert results[0].field == "custom"
+        assert results[0].distinct_values == 3
+
+    def test_splitter_result_contents(self, analyzer, sample_documents):
+        """SplitterResult should contain expected data."""
+        results = analyzer.find_splitters(sample_documents)
+        best = results[0]
+
+        assert isinstance(best.score, float)
+        assert best.coverage == 1.0  # All docs have header.action
+        assert best.value_counts == {
+            "OrderCreated": 3,
+            "UserCreated": 2,
+            "EventLogged": 2
+        }
+
+    def test_describe_output(self, analyzer, sample_documents):
+        """describe() should return formatted string."""
+        output = analyzer.describe(sample_documents)
+
+        assert "Documents analyzed: 7" in output
+        assert "header.action" in output
+        assert "RECOMMENDED" in output
+
+    def test_empty_documents(self, analyzer):
+        """Should handle empty document list."""
+        results = analyzer.find_splitters([])
+        assert results == []
+
+        output = analyzer.describe([])
+        assert "No documents" in output
+
+    def test_uniform_structure(self, analyzer):
+        """Documents with identical structure - no good splitter."""
+        docs = [
+            {"type": "A", "value": 1},
+            {"type": "B", "value": 2},
+            {"type": "C", "value": 3},
+        ]
+        results = analyzer.find_splitters(docs)
+
+        # May find type as candidate, but score should be ~1 (no differentiation)
+        if results:
+            # Score near 1 means within-group ≈ between-group similarity
+            assert results[0].score < 2.0
+
+    def test_get_structure_by_value(self, analyzer, sample_documents):
+        """get_structure_by_value should return detailed summaries."""
+        summaries = analyzer.get_structure_by_value(
+            sample_documents,
+            splitter="header.action"
+        )
+
+        assert "OrderCreated" in summaries
+        assert "UserCreated" in summaries
+
+        order_summary = summaries["OrderCreated"]
+        assert order_summary.count == 3
+        assert "body.items[].sku" in order_summary.unique_paths
+
+        user_summary = summaries["UserCreated"]
+        assert user_summary.count == 2
+        assert "body.user.name" in user_summary.unique_paths
+
+    def test_doc_paths_reused_across_calls(self, analyzer, sample_documents):
+        """Analyzing the same collection twice should extract paths once."""
+        calls = []
+        extract = analyzer.extractor.extract
+        analyzer.extractor.extract = lambda doc: calls.append(doc) or extract(doc)
+
+        analyzer.describe(sample_documents)
+        analyzer.get_structure_by_value(sample_documents, splitter="header.action")
+        assert len(calls) == len(sample_documents)
+
+        sample_documents.append({"header": {"action": "UserCreated"}})
+        analyzer.find_splitters(sample_documents)
+        assert len(calls) == 2 * len(sample_documents) - 1
+
+
+    def test_precomputed_paths(self, analyzer, sample_documents):
+        paths = [PathExtractor().extract(doc) for doc in sample_documents]
+        results = analyzer.find_splitters(sample_documents, precomputed_paths=paths)
+        assert results[0].field == "header.action"
+
+        with pytest.raises(ValueError):
+            analyzer.find_splitters(sample_documents, precomputed_paths=paths[:1])
+
+    def test_sample_size(self, analyzer, sample_documents):
+        """Sampling should still find the splitter and count only the sample."""
+        documents = sample_documents * 20
+        results = analyzer.find_splitters(documents, sample_size=50)
+
+        assert results[0].field == "header.action"
+        assert sum(results[0].value_counts.values()) == 50
+
+    def test_sample_size_accepts_iterators(self, analyzer, sample_documents):
+        results = analyzer.find_splitters(iter(sample_documents * 20), sample_size=50)
+        assert results[0].field == "header.action"
+
+    def test_identical_structures_share_path_sets(self, analyzer, sample_documents):
+        doc_paths = analyzer._get_doc_paths(sample_documents)
+        assert doc_paths[0] is doc_paths[1]
+        assert doc_paths[0] is not doc_paths[3]
+
+    def test_wide_path_universe_skips_bitsets(self, sample_documents):
+        """Above MAX_BITSET_PATHS, scoring should fall back to path sets."""
+        analyzer = StructureAnalyzer()
+        analyzer.MAX_BITSET_PATHS = 2
+        fallback = analyzer.find_splitters(sample_documents)
+        expected = StructureAnalyzer().find_splitters(sample_documents)
+
+        assert analyzer._get_doc_bitsets(analyzer._get_doc_paths(sample_documents)) is None
+        assert fallback[0].score == pytest.approx(expected[0].score)
+
+    @pytest.mark.parametrize("strategy", [
+        JaccardPathSimilarity(), WeightedJaccardSimilarity(), ExactMatchSimilarity()
+    ])
+    def test_structure_similarity_matches_pairwise(self, strategy, sample_documents):
+        """Scores from the cached structure matrix should equal brute-force pairs."""
+        analyzer = StructureAnalyzer(similarity_strategy=strategy)
+        documents = sample_documents * 3
+        result = analyzer.find_splitters(documents, grouping_field="header.action")[0]
+
+        paths = [PathExtractor().extract(doc) for doc in documents]
+        groups = {}
+        for doc, doc_set in zip(documents, paths):
+            groups.setdefault(doc["header"]["action"], []).append(doc_set)
+        within = [strategy.similarity(a, b)
+                  for members in groups.values() for a, b in combinations(members, 2)]
+        between = [strategy.similarity(a[0], b[0])
+                   for a, b in combinations(groups.values(), 2)]
+
+        assert analyzer._get_structure_similarity(analyzer._get_doc_paths(documents)) is not None
+        assert result.within_similarity == pytest.approx(sum(within) / len(within))
+        assert result.between_similarity == pytest.approx(sum(between) / len(between))
+
+    def test_many_structures_skip_similarity_matrix(self, sample_documents):
+        analyzer = StructureAnalyzer()
+        analyzer.MAX_SIMILARITY_STRUCTURES = 1
+        fallback = analyzer.find_splitters(sample_documents)
+        expected = StructureAnalyzer().find_splitters(sample_documents)
+
+        assert analyzer._get_structure_similarity(analyzer._get_doc_paths(sample_documents)) is None
+        assert fallback[0].score == pytest.approx(expected[0].score)
+
+    def test_parallel_extraction(self, sample_documents):
+        """Process-pool extraction should match serial extraction."""
+        documents = sample_documents * 40
+        serial = StructureAnalyzer().find_splitters(documents)
+        parallel = StructureAnalyzer(n_workers=2).find_splitters(documents)
+
+        assert [r.field for r in parallel] == [r.field for r in serial]
+        assert parallel[0].score == pytest.approx(serial[0].score)
+
+
+class TestSampleDocuments:
+    """Tests for reproducible document sampling."""
+
+    def test_small_input_unchanged(self):
+        docs = [{"i": i} for i in range(5)]
+        assert sample_documents(docs, 10) == docs
+
+    def test_sequence_sample_keeps_order(self):
+        docs = [{"i": i} for i in range(1000)]
+        sample = sample_documents(docs, 100)
+        assert len(sample) == 100
+        assert [d["i"] for d in sample] == sorted(d["i"] for d in sample)
+        assert sample == sample_documents(docs, 100)
+
+    def test_iterator_reservoir(self):
+        sample = sample_documents(({"i": i} for i in range(1000)), 100)
+        assert len(sample) == 100
+        assert [d["i"] for d in sample] == sorted(d["i"] for d in sample)
+
+
+class TestSplitterDetectionAccuracy:
+    """Tests to verify splitter detection works on realistic data."""
+
+    @pytest.fixture
+    def analyzer(self):
+        return StructureAnalyzer()
+
+    def test_ocpp_like_messages(self, analyzer):
+        """Test with OCPP-like charge point messages."""
+        docs = [
+            # MeterValues - have meterValue array
+            {
+                "header": {"action": "MeterValues"},
+                "body": {"meterValue": [{"timestamp": "2024-01-01", "sampledValue": [{"value": "100"}]}]}
+            },
+            {
+                "header": {"action": "MeterValues"},
+                "body": {"meterValue": [{"timestamp": "2024-01-02", "sampledValue": [{"value": "200"}]}]}
+            },
+            # StatusNotification - have status/errorCode
+            {
+                "header": {"action": "StatusNotification"},
+                "body": {"status": "Available", "errorCode": "NoError"}
+            },
+            {
+                "header": {"action": "StatusNotification"},
+                "body": {"status": "Charging", "errorCode": "NoError"}
+            },
+            # Heartbeat - minimal body
+            {
+                "header": {"action": "Heartbeat"},
+                "body": {}
+            },
+            {
+                "header": {"action": "Heartbeat"},
+                "body": {}
+            },
+        ]
+
+        results = analyzer.find_splitters(docs)
+
+        assert len(results) > 0
+        assert results[0].field == "header.action"
+        assert results[0].score > 1.5  # Should clearly differentiate
+
+    def test_high_cardinality_excluded(self, analyzer):
+        """Fields with too many distinct values should be excluded."""
+        docs = [
+            {"id": f"unique-{i}", "type": "A" if i < 5 else "B", "value": i}
+            for i in range(10)
+        ]
+
+        results = analyzer.find_splitters(docs, max_cardinality=5)
+
+        # 'id' has 10 distinct values, should be excluded
+        # 'type' has 2 values, should be included
+        field_names = [r.field for r in results]
+        assert "id" not in field_names
+        assert "type" in field_names
@@ -0,0 +1,59 @@
+"""Tests for the JSON encoding and decoding helpers."""
+import json
+from datetime import datetime
+
+import pytest
+
+from common import jsonio
+
+
+@pytest.fixture(autouse=True, params=["orjson", "stdlib"])
+def backend(request, monkeypatch):
+    """Run every test against both orjson (when installed) and the stdlib."""
+    if request.param == "orjson" and not jsonio.HAS_ORJSON:
+        pytest.skip("orjson not installed")
+    monkeypatch.setattr(jsonio, "HAS_ORJSON", request.param == "orjson")
+    return request.param
+
+
+class TestLoads:
+    """Tests for jsonio.loads."""
+
+    def test_bytes_and_str(self):
+        assert jsonio.loads(b'{"a": [1, 2.5, "x"]}') == {"a": [1, 2.5, "x"]}
+        assert jsonio.loads('{"a": null}') == {"a": None}
+
+    def test_non_ascii(self):
+        assert jsonio.loads('{"name": "Zoë"}'.encode('utf-8')) == {"name": "Zoë"}
+
+    def test_nan_literal(self):
+        # Accepted by the stdlib but not by orjson
+        result = jsonio.loads(b'{"n": NaN}')
+        assert result["n"] != result["n"]
+
+    def test_invalid_json_raises(self):
+        with pytest.raises(ValueError):
+            jsonio.loads(b'{"a": ')
+
+
+class TestDumps:
+    """Tests for jsonio.dumps."""
+
+    def test_round_trip(self):
+        data = {"a": [1, 2.5, "x", None, True], "b": {"c": "Zoë"}}
+        assert json.loads(jsonio.dumps(data)) == data
+
+    def test_returns_bytes(self):
+        assert isinstance(jsonio.dumps({"a": 1}), bytes)
+
+    def test_datetime_uses_default(self):
+        data = {"ts": datetime(2024, 1, 15, 10, 30)}
+        assert json.loads(jsonio.dumps(data)) == {"ts": "2024-01-15 10:30:00"}
+
+    def test_non_string_keys(self):
+        assert json.loads(jsonio.dumps({1: "a"})) == {"1": "a"}
+
+    @pytest.mark.parametrize("indent", [2, 4])
+    def test_indent(self, indent):
+        body = jsonio.dumps({"a": {"b": 1}}, indent=indent)
+        assert b"\n" + b" " * indent + b'"a"' in body